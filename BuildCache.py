@@ -0,0 +1,166 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import hashlib
+import json
+import os
+import typing
+
+
+def file_hash(path: str) -> typing.Optional[str]:
+    """
+    Returns:
+        str: the SHA-256 hex digest of the file's content, or None if the
+        file cannot be read.
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 16), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def compiler_fingerprint(*options: str) -> str:
+    """Fingerprints the compiler: the sources of the modules it is made of,
+    and the options that affect its output. A build made by a compiler with
+    a different fingerprint is never reused.
+
+    Args:
+        options (str): the options that affect the output.
+
+    Returns:
+        str: the fingerprint.
+    """
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for module in sorted(os.listdir(directory)):
+        if module.endswith(".py"):
+            digest.update(module.encode())
+            digest.update(file_hash(os.path.join(directory, module)).encode())
+    for option in options:
+        digest.update(b"\0" + option.encode())
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """A persistent manifest of previous builds, mapping every input file to
+    the hash of its content, the compiler fingerprint, and the hash of the
+    output it was built into. An input is up to date if none of these have
+    changed since it was built.
+    """
+
+    MANIFEST = ".JackAnalyzer.cache.json"
+
+    def __init__(self, cache_dir: str, fingerprint: str,
+                 force: bool = False) -> None:
+        """Loads the manifest from the cache directory, if there is one.
+
+        Args:
+            cache_dir (str): the directory of the manifest.
+            fingerprint (str): the fingerprint of the running compiler.
+            force (bool): consider every input out of date.
+        """
+        self.cache_dir = cache_dir
+        self.fingerprint = fingerprint
+        self.force = force
+        self.manifest_path = os.path.join(cache_dir, BuildCache.MANIFEST)
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(self.manifest_path, 'r') as manifest:
+                self.entries = json.load(manifest)
+        except (OSError, ValueError):
+            self.entries = {}
+        self._input_hashes = {}
+
+    def key(self, path: str) -> str:
+        """
+        Returns:
+            str: the path as recorded in the manifest, relative to the cache
+            directory.
+        """
+        return os.path.relpath(path, self.cache_dir)
+
+    def is_up_to_date(self, input_path: str, output_path: str) -> bool:
+        """Checks whether the output was built from the current content of
+        the input by the running compiler, and was not changed since. Counts
+        a hit or a miss.
+
+        Args:
+            input_path (str): the path of the input.
+            output_path (str): the path of its output.
+
+        Returns:
+            bool: True if the input does not need to be built again.
+        """
+        input_hash = self._input_hashes[input_path] = file_hash(input_path)
+        entry = self.entries.get(self.key(input_path))
+        up_to_date = (
+            not self.force and entry is not None and input_hash is not None and
+            entry["input"] == input_hash and
+            entry["fingerprint"] == self.fingerprint and
+            entry["output_path"] == self.key(output_path) and
+            entry["output"] == file_hash(output_path))
+        if up_to_date:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return up_to_date
+
+    def update(self, input_path: str, output_path: str) -> None:
+        """Records that the input was just built into the output.
+
+        Args:
+            input_path (str): the path of the input.
+            output_path (str): the path of its output.
+        """
+        input_hash = self._input_hashes.pop(input_path, None)
+        if input_hash is None:
+            input_hash = file_hash(input_path)
+        self.entries[self.key(input_path)] = {
+            "input": input_hash,
+            "fingerprint": self.fingerprint,
+            "output_path": self.key(output_path),
+            "output": file_hash(output_path),
+        }
+
+    def forget(self, input_path: str) -> None:
+        """Drops the record of the input, e.g. if building it failed.
+
+        Args:
+            input_path (str): the path of the input.
+        """
+        self._input_hashes.pop(input_path, None)
+        self.entries.pop(self.key(input_path), None)
+
+    def save(self) -> None:
+        """Writes the manifest to the cache directory."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temporary_path = self.manifest_path + ".tmp"
+        with open(temporary_path, 'w') as manifest:
+            json.dump(self.entries, manifest, indent=1, sort_keys=True)
+        os.replace(temporary_path, self.manifest_path)
+
+    def reset_statistics(self) -> None:
+        """Starts counting the hits and misses from zero, e.g. for the next
+        build with the same cache.
+        """
+        self.hits = 0
+        self.misses = 0
+
+    def statistics(self) -> str:
+        """
+        Returns:
+            str: a summary of the cache hits and misses.
+        """
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0
+        return (f"Build cache: {self.hits} hits, {self.misses} misses "
+                f"({rate:.0f}% hit rate)")
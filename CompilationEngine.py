@@ -7,36 +7,162 @@ Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
 
+import Grammar
+import JackAST
 import JackTokenizer
+from Emitter import Emitter, NullEmitter, XMLEmitter
+
+# A diagnostic: the line and the column of the token it is about (None for
+# the end of the input), and its message.
+Diagnostic = typing.Tuple[int, typing.Optional[int], str]
+
+
+class JackSyntaxError(ValueError):
+    """One or more syntax errors in a file, with their positions."""
+
+    def __init__(self, diagnostics: typing.List[Diagnostic]) -> None:
+        """
+        Args:
+            diagnostics (list): the diagnostics of the errors, in order.
+        """
+        super().__init__("\n".join(
+            f"{message} (line {line}, column {column})" if column else
+            f"{message} (line {line})"
+            for line, column, message in diagnostics))
+        self.diagnostics = diagnostics
 
 
 class CompilationEngine:
     """Gets input from a JackTokenizer and emits its parsed structure into an
-    output stream.
+    output stream, through an Emitter.
     """
 
-    UNARY_OP = {'-', '~', '^', '#'}
     KEYWORD_CONSTANTS = {'true', 'false', 'null', 'this'}
-    STATEMENT_PREFIX = {"while", "do", "return", "let", "if"}
-    OP = {'+', '-', '*', '/', '&amp;', '|', '&gt;', '&lt;', '='}
+    OP = {'+', '-', '*', '/', '&', '|', '>', '<', '='}
+
+    # The productions of a term, as the states of compile_nested in which
+    # they are parsed, numbered after its other states.
+    (NAME, INTEGER, STRING, KEYWORD_CONSTANT, PARENS, UNARY) = range(8, 14)
+
+    # The LL(1) parsing tables, built from the FIRST sets of Grammar and
+    # indexed by JackTokenizer.lookahead(): every decision between several
+    # productions is a single lookup. A decision on a single token compares
+    # its lookahead key directly.
+    CLASS_VAR_DEC = Grammar.FIRST["classVarDec"]
+    SUBROUTINE_DEC = Grammar.FIRST["subroutineDec"]
+    VAR_DEC = Grammar.FIRST["varDec"]
+    OPS = Grammar.FIRST["op"]
+    TYPES = Grammar.dispatch_table("type", {
+        "'int'": "keyword", "'char'": "keyword", "'boolean'": "keyword",
+        "className": "identifier"})
+    STATEMENTS = Grammar.dispatch_table("statement", {
+        "letStatement": "compile_let", "ifStatement": "compile_if",
+        "whileStatement": "compile_while", "doStatement": "compile_do",
+        "returnStatement": "compile_return"})
+    TERMS = Grammar.dispatch_table("term", {
+        "integerConstant": INTEGER, "stringConstant": STRING,
+        "keywordConstant": KEYWORD_CONSTANT, "varName termSuffix?": NAME,
+        "'(' expression ')'": PARENS, "unaryOp term": UNARY})
+
+    # The tokens at which parsing resumes after a syntax error, outside of
+    # the braces skipped to reach them: within a class, the keywords that
+    # start a member; within statements, also the end of a statement or a
+    # block and the keywords that start a statement or a declaration; and
+    # within the header of a subroutine, also the start of its body.
+    MEMBER_SYNC = (Grammar.FIRST["classVarDec"] |
+                   Grammar.FIRST["subroutineDec"])
+    STATEMENT_SYNC = (MEMBER_SYNC | Grammar.FIRST["statement"] |
+                      Grammar.FIRST["varDec"] | {";", "}"})
+    BODY_SYNC = MEMBER_SYNC | {"{"}
 
     def __init__(self, input_stream: JackTokenizer,
-                 output_stream: typing.TextIO) -> None:
+                 output_stream: typing.Optional[typing.TextIO],
+                 emitter: typing.Optional[Emitter] = None) -> None:
         """
         Creates a new compilation engine with the given input and output. The
         next routine called must be compileClass()
         :param input_stream: The input stream.
         :param output_stream: The output stream.
+        :param emitter: The emitter of the parsed structure. If not given,
+        the structure is written to the output stream as XML.
         """
-        # Your code goes here!
-        # Note that you can write to output_stream like so:
-        # output_stream.write("Hello world! \n")
         self.tokenizer = input_stream
         self.tokenizer.advance()  # now tokenizer set to first token
         self.output_stream = output_stream
+        if emitter is None:
+            emitter = XMLEmitter(output_stream)
+        self.emitter = emitter
+        self.diagnostics = []  # the syntax errors recovered from
+
+    def error(self, expected: str) -> typing.NoReturn:
+        """Raises a JackSyntaxError about the current token.
+
+        Args:
+            expected (str): what was expected instead of the current token.
+        """
+        line, column = self.tokenizer.position()
+        raise JackSyntaxError([(
+            line, column, f"Expected {expected}, got "
+                          f"{self.tokenizer.token_type()} "
+                          f"'{self.tokenizer.lexeme()}'")])
+
+    def expect(self, key: str) -> str:
+        """Advances past the current token, which must be the given keyword
+        or symbol.
+
+        Returns:
+            str: the keyword or the symbol.
+        """
+        if self.tokenizer.lookahead() != key:
+            self.error(f"'{key}'")
+        self.tokenizer.advance()
+        return key
+
+    def expect_identifier(self) -> str:
+        """Advances past the current token, which must be an identifier.
+
+        Returns:
+            str: the identifier.
+        """
+        if self.tokenizer.lookahead() != JackTokenizer.IDENTIFIER:
+            self.error("an identifier")
+        identifier = self.tokenizer.identifier()
+        self.tokenizer.advance()
+        return identifier
+
+    def recover(self, error: JackSyntaxError,
+                sync: typing.AbstractSet[Grammar.Key]) -> None:
+        """Records a syntax error, and skips to the next token in sync that
+        is not inside the braces that are skipped, or to the last token.
+        Nothing is emitted once there is an error, since the parsed
+        structure is broken.
+        """
+        self.diagnostics.extend(error.diagnostics)
+        self.emitter = NullEmitter()
+        tokenizer = self.tokenizer
+        depth = 0
+        while True:
+            key = tokenizer.lookahead()
+            if depth == 0 and key in sync:
+                return
+            if key == "{":
+                depth += 1
+            elif key == "}" and depth:
+                depth -= 1
+            if not tokenizer.has_more_tokens():
+                return
+            tokenizer.advance()
+
+    def recover_statement(self, error: JackSyntaxError) -> None:
+        """Recovers from a syntax error in a statement or a declaration,
+        resuming after its ';' if it is found.
+        """
+        self.recover(error, CompilationEngine.STATEMENT_SYNC)
+        if self.tokenizer.lookahead() == ";":
+            self.tokenizer.advance()
 
     def writeTag(self, tag: str, content: str):
-        self.output_stream.write(f"<{tag}> {content} </{tag}>\n")
+        self.emitter.terminal(tag, content)
 
     def writeKeyword(self, content: str):
         self.writeTag("keyword", content)
@@ -54,49 +180,77 @@ class CompilationEngine:
         self.writeTag("stringConstant", content)
 
     def compile_class(self) -> None:
-        """Compiles a complete class."""
-        self.output_stream.write("<class>\n")
-
-        self.writeKeyword(self.tokenizer.keyword())  # 'class'
-        self.tokenizer.advance()
-        self.writeIdentifier(self.tokenizer.identifier())  # class name
-        self.tokenizer.advance()
-        self.writeSymbol(self.tokenizer.symbol())  # {
-        self.tokenizer.advance()
-
-        while (self.tokenizer.token_type() == "KEYWORD" and
-               self.tokenizer.keyword() in {"static", "field"}):
-            self.compile_class_var_dec()
+        """Compiles a complete class. Syntax errors are recovered from in
+        panic mode, so that all of them are found in a single pass: they
+        are raised together at the end, as a single JackSyntaxError.
+        """
+        try:
+            self.compile_class_members()
+        except JackSyntaxError as error:
+            self.diagnostics.extend(error.diagnostics)
+        except IndexError:  # the tokens ran out
+            self.diagnostics.append(
+                (self.tokenizer.line, None, "Unexpected end of input"))
+        if self.diagnostics:
+            raise JackSyntaxError(self.diagnostics)
+        self.emitter.flush()
+
+    def compile_class_members(self) -> None:
+        """Compiles a complete class, recovering from syntax errors in its
+        members.
+        """
+        self.emitter.open_tag("class")
+
+        self.writeKeyword(self.expect("class"))
+        self.writeIdentifier(self.expect_identifier())  # class name
+        self.writeSymbol(self.expect("{"))
+
+        while self.tokenizer.lookahead() in CompilationEngine.CLASS_VAR_DEC:
+            try:
+                self.compile_class_var_dec()
+            except JackSyntaxError as error:
+                self.recover(error, CompilationEngine.MEMBER_SYNC)
+
+        while self.tokenizer.lookahead() in CompilationEngine.SUBROUTINE_DEC:
+            try:
+                self.compile_subroutine()
+            except JackSyntaxError as error:
+                self.recover(error, CompilationEngine.MEMBER_SYNC)
+
+        if (self.tokenizer.lookahead() == "}" and
+                self.tokenizer.has_more_tokens()):
+            # the class must be all of the file
+            self.tokenizer.advance()
+            self.error("the end of input")
+        self.writeSymbol(self.expect("}"))
+        self.emitter.close_tag("class")
 
-        while (self.tokenizer.token_type() == "KEYWORD" and
-               self.tokenizer.keyword() in {"constructor", "function",
-                                            "method"}):
-            self.compile_subroutine()
+    def parse_class(self) -> JackAST.Class:
+        """Parses a complete class into a tree, instead of emitting it.
 
-        self.writeSymbol(self.tokenizer.symbol())  # }
-        self.output_stream.write("</class>")
+        Returns:
+            JackAST.Class: the parse tree of the class.
+        """
+        builder = JackAST.ASTBuilder()
+        self.emitter = builder
+        self.compile_class()
+        return builder.root
 
     def compile_class_var_dec(self) -> None:
         """Compiles a static declaration or a field declaration."""
-        self.output_stream.write("<classVarDec>\n")
+        self.emitter.open_tag("classVarDec")
         self.writeKeyword(self.tokenizer.keyword())  # 'field/static'
         self.tokenizer.advance()
         self.compile_type()  # type
-        self.tokenizer.advance()
-        self.writeIdentifier(self.tokenizer.identifier())  # varName
-        self.tokenizer.advance()
+        self.writeIdentifier(self.expect_identifier())  # varName
 
         # handle additional variable names separated by commas
-        while (self.tokenizer.token_type() == "SYMBOL" and
-               self.tokenizer.symbol() == ','):
-            self.writeSymbol(self.tokenizer.symbol())  # ,
-            self.tokenizer.advance()
-            self.writeIdentifier(self.tokenizer.identifier())  # varName
-            self.tokenizer.advance()
+        while self.tokenizer.lookahead() == ',':
+            self.writeSymbol(self.expect(","))
+            self.writeIdentifier(self.expect_identifier())  # varName
 
-        self.writeSymbol(self.tokenizer.symbol())  # ;
-        self.tokenizer.advance()
-        self.output_stream.write("</classVarDec>\n")
+        self.writeSymbol(self.expect(";"))
+        self.emitter.close_tag("classVarDec")
 
     def compile_subroutine(self) -> None:
         """
@@ -104,204 +258,155 @@ class CompilationEngine:
         You can assume that classes with constructors have at least one field,
         you will understand why this is necessary in project 11.
         """
-        self.output_stream.write("<subroutineDec>\n")
+        self.emitter.open_tag("subroutineDec")
         self.writeKeyword(
             self.tokenizer.keyword())  # 'constractor/function/method'
         self.tokenizer.advance()
-        if self.tokenizer.token_type() == "KEYWORD" and self.tokenizer.keyword() == 'void':
-            self.writeKeyword(self.tokenizer.keyword())  # 'void'
-        else:
-            self.compile_type()  # type
-        self.tokenizer.advance()
-        self.writeIdentifier(self.tokenizer.identifier())  # subRoutineName
-        self.tokenizer.advance()
-        self.writeSymbol(self.tokenizer.symbol())  # (
-        self.tokenizer.advance()
-        self.compile_parameter_list()  # parameter list
-        self.writeSymbol(self.tokenizer.symbol())  # )
-        self.tokenizer.advance()
-        self.output_stream.write("<subroutineBody>\n")
-        self.writeSymbol(self.tokenizer.symbol())  # {
-        self.tokenizer.advance()
+        try:
+            if self.tokenizer.lookahead() == 'void':
+                self.writeKeyword(self.expect("void"))
+            else:
+                self.compile_type()  # type
+            self.writeIdentifier(self.expect_identifier())  # subRoutineName
+            self.writeSymbol(self.expect("("))
+            self.compile_parameter_list()  # parameter list
+            self.writeSymbol(self.expect(")"))
+        except JackSyntaxError as error:
+            # resume at the body, to find the errors in it too
+            self.recover(error, CompilationEngine.BODY_SYNC)
+            if self.tokenizer.lookahead() != "{":
+                return  # there is no body, the class goes on from here
+        self.emitter.open_tag("subroutineBody")
+        self.writeSymbol(self.expect("{"))
 
         # compile variable declarations
-        while self.tokenizer.token_type() == "KEYWORD" and self.tokenizer.keyword() == "var":
-            self.compile_var_dec()
+        while self.tokenizer.lookahead() in CompilationEngine.VAR_DEC:
+            try:
+                self.compile_var_dec()
+            except JackSyntaxError as error:
+                self.recover_statement(error)
 
         self.compile_statements()  # routine body - dec
-        self.writeSymbol(self.tokenizer.symbol())  # }
-        self.tokenizer.advance()
-        self.output_stream.write("</subroutineBody>\n")
+        self.writeSymbol(self.expect("}"))
+        self.emitter.close_tag("subroutineBody")
 
-        self.output_stream.write("</subroutineDec>\n")
+        self.emitter.close_tag("subroutineDec")
 
     def compile_parameter_list(self) -> None:
         """Compiles a (possibly empty) parameter list, not including the
         enclosing "()".
         """
-        self.output_stream.write("<parameterList>\n")
-        if not (
-                self.tokenizer.token_type() == "SYMBOL" and self.tokenizer.symbol() == ")"):
+        self.emitter.open_tag("parameterList")
+        if self.tokenizer.lookahead() != ")":
             self.compile_type()  # type
-            self.tokenizer.advance()
-            self.writeIdentifier(self.tokenizer.identifier())  # var name
-            self.tokenizer.advance()
+            self.writeIdentifier(self.expect_identifier())  # var name
 
             # handle additional variable names separated by commas
-            while (self.tokenizer.token_type() == "SYMBOL" and
-                   self.tokenizer.symbol() == ','):
-                self.writeSymbol(self.tokenizer.symbol())  # ,
-                self.tokenizer.advance()
+            while self.tokenizer.lookahead() == ',':
+                self.writeSymbol(self.expect(","))
                 self.compile_type()  # type
-                self.tokenizer.advance()
-                self.writeIdentifier(self.tokenizer.identifier())  # var name
-                self.tokenizer.advance()
+                self.writeIdentifier(self.expect_identifier())  # var name
 
-        self.output_stream.write("</parameterList>\n")
+        self.emitter.close_tag("parameterList")
 
     def compile_var_dec(self) -> None:
         """Compiles a var declaration."""
-        self.output_stream.write("<varDec>\n")
+        self.emitter.open_tag("varDec")
         self.writeKeyword(self.tokenizer.keyword())  # 'var'
         self.tokenizer.advance()
         self.compile_type()  # type
-        self.tokenizer.advance()
-        self.writeIdentifier(self.tokenizer.identifier())  # varName
-        self.tokenizer.advance()
+        self.writeIdentifier(self.expect_identifier())  # varName
 
         # handle additional variable names separated by commas
-        while (self.tokenizer.token_type() == "SYMBOL" and
-               self.tokenizer.symbol() == ','):
-            self.writeSymbol(self.tokenizer.symbol())  # ,
-            self.tokenizer.advance()
-            self.writeIdentifier(self.tokenizer.identifier())  # varName
-            self.tokenizer.advance()
+        while self.tokenizer.lookahead() == ',':
+            self.writeSymbol(self.expect(","))
+            self.writeIdentifier(self.expect_identifier())  # varName
 
-        self.writeSymbol(self.tokenizer.symbol())  # ;
-        self.tokenizer.advance()
+        self.writeSymbol(self.expect(";"))
 
-        self.output_stream.write("</varDec>\n")
+        self.emitter.close_tag("varDec")
 
     def compile_statements(self) -> None:
         """Compiles a sequence of statements, not including the enclosing
         "{}".
         """
-        self.output_stream.write("<statements>\n")
-        while (self.tokenizer.token_type() == "KEYWORD" and
-               self.tokenizer.keyword() in CompilationEngine.STATEMENT_PREFIX):
-            if self.tokenizer.keyword() == "do":
-                self.compile_do()
-            elif self.tokenizer.keyword() == "let":
-                self.compile_let()
-            elif self.tokenizer.keyword() == "while":
-                self.compile_while()
-            elif self.tokenizer.keyword() == "return":
-                self.compile_return()
-            elif self.tokenizer.keyword() == "if":
-                self.compile_if()
-            else:
-                raise ValueError(
-                    f"Unsupported token type: {self.tokenizer.keyword()}")
-        self.output_stream.write("</statements>\n")
+        self.emitter.open_tag("statements")
+        statements = CompilationEngine.STATEMENTS
+        compile_statement = statements.get(self.tokenizer.lookahead())
+        while compile_statement is not None:
+            try:
+                getattr(self, compile_statement)()
+            except JackSyntaxError as error:
+                self.recover_statement(error)
+            compile_statement = statements.get(self.tokenizer.lookahead())
+        self.emitter.close_tag("statements")
 
     def compile_do(self) -> None:
         """Compiles a do statement."""
-        self.output_stream.write("<doStatement>\n")
-        self.writeKeyword(self.tokenizer.keyword())  # do
-        self.tokenizer.advance()
-        var_name = self.tokenizer.identifier()
-        self.tokenizer.advance()
+        self.emitter.open_tag("doStatement")
+        self.writeKeyword(self.expect("do"))
+        var_name = self.expect_identifier()
         self.compile_subroutine_call(var_name)  # subroutineCall
-        self.writeSymbol(self.tokenizer.symbol())  # ;
-        self.tokenizer.advance()
-        self.output_stream.write("</doStatement>\n")
+        self.writeSymbol(self.expect(";"))
+        self.emitter.close_tag("doStatement")
 
     def compile_let(self) -> None:
         """Compiles a let statement."""
-        self.output_stream.write("<letStatement>\n")
-        self.writeKeyword(self.tokenizer.keyword())  # let
-        self.tokenizer.advance()
-        self.writeIdentifier(self.tokenizer.identifier())  # varName
-        self.tokenizer.advance()
-        if self.tokenizer.token_type() == "SYMBOL" and self.tokenizer.symbol() == "[":
-            self.writeSymbol(self.tokenizer.symbol())  # [
-            self.tokenizer.advance()
+        self.emitter.open_tag("letStatement")
+        self.writeKeyword(self.expect("let"))
+        self.writeIdentifier(self.expect_identifier())  # varName
+        if self.tokenizer.lookahead() == "[":
+            self.writeSymbol(self.expect("["))
             self.compile_expression()  # expression
-            self.writeSymbol(self.tokenizer.symbol())  # ]
-            self.tokenizer.advance()
-        self.writeSymbol(self.tokenizer.symbol())  # =
-        self.tokenizer.advance()
+            self.writeSymbol(self.expect("]"))
+        self.writeSymbol(self.expect("="))
         self.compile_expression()  # expression
-        self.writeSymbol(self.tokenizer.symbol())  # ;
-        self.tokenizer.advance()
-        self.output_stream.write("</letStatement>\n")
+        self.writeSymbol(self.expect(";"))
+        self.emitter.close_tag("letStatement")
 
     def compile_while(self) -> None:
         """Compiles a while statement."""
-        self.output_stream.write("<whileStatement>\n")
-        self.writeKeyword(self.tokenizer.keyword())  # while
-        self.tokenizer.advance()
-        self.writeSymbol(self.tokenizer.symbol())  # (
-        self.tokenizer.advance()
+        self.emitter.open_tag("whileStatement")
+        self.writeKeyword(self.expect("while"))
+        self.writeSymbol(self.expect("("))
         self.compile_expression()  # expression
-        self.writeSymbol(self.tokenizer.symbol())  # )
-        self.tokenizer.advance()
-        self.writeSymbol(self.tokenizer.symbol())  # {
-        self.tokenizer.advance()
+        self.writeSymbol(self.expect(")"))
+        self.writeSymbol(self.expect("{"))
         self.compile_statements()  # statements
-        self.writeSymbol(self.tokenizer.symbol())  # }
-        self.tokenizer.advance()
-        self.output_stream.write("</whileStatement>\n")
+        self.writeSymbol(self.expect("}"))
+        self.emitter.close_tag("whileStatement")
 
     def compile_return(self) -> None:
         """Compiles a return statement."""
-        self.output_stream.write("<returnStatement>\n")
-        self.writeKeyword(self.tokenizer.keyword())  # return
-        self.tokenizer.advance()
-        if not (self.tokenizer.token_type() == "SYMBOL" and
-                self.tokenizer.symbol() == ";"):
+        self.emitter.open_tag("returnStatement")
+        self.writeKeyword(self.expect("return"))
+        if self.tokenizer.lookahead() != ";":
             self.compile_expression()
-        self.writeSymbol(self.tokenizer.symbol())  # ;
-        self.tokenizer.advance()
-        self.output_stream.write("</returnStatement>\n")
+        self.writeSymbol(self.expect(";"))
+        self.emitter.close_tag("returnStatement")
 
     def compile_if(self) -> None:
         """Compiles a if statement, possibly with a trailing else clause."""
         # - ifStatement: 'if' '(' expression ')' '{' statements '}' ('else' '{'
         #                    statements '}')?
-        self.output_stream.write("<ifStatement>\n")
-        self.writeKeyword(self.tokenizer.keyword())  # if
-        self.tokenizer.advance()
-        self.writeSymbol(self.tokenizer.symbol())  # (
-        self.tokenizer.advance()
+        self.emitter.open_tag("ifStatement")
+        self.writeKeyword(self.expect("if"))
+        self.writeSymbol(self.expect("("))
         self.compile_expression()
-        self.writeSymbol(self.tokenizer.symbol())  # )
-        self.tokenizer.advance()
-        self.writeSymbol(self.tokenizer.symbol())  # {
-        self.tokenizer.advance()
+        self.writeSymbol(self.expect(")"))
+        self.writeSymbol(self.expect("{"))
         self.compile_statements()
-        self.writeSymbol(self.tokenizer.symbol())  # }
-        self.tokenizer.advance()
-        if self.tokenizer.token_type() == "KEYWORD" and self.tokenizer.keyword() == "else":
-            self.writeKeyword(self.tokenizer.keyword())  # else
-            self.tokenizer.advance()
-            self.writeSymbol(self.tokenizer.symbol())  # {
-            self.tokenizer.advance()
+        self.writeSymbol(self.expect("}"))
+        if self.tokenizer.lookahead() == "else":
+            self.writeKeyword(self.expect("else"))
+            self.writeSymbol(self.expect("{"))
             self.compile_statements()
-            self.writeSymbol(self.tokenizer.symbol())  # }
-            self.tokenizer.advance()
-        self.output_stream.write("</ifStatement>\n")
+            self.writeSymbol(self.expect("}"))
+        self.emitter.close_tag("ifStatement")
 
     def compile_expression(self) -> None:
         """Compiles an expression."""
-        self.output_stream.write("<expression>\n")
-        self.compile_term()
-        while (self.tokenizer.token_type() == "SYMBOL" and
-               self.tokenizer.symbol() in CompilationEngine.OP):
-            self.writeSymbol(self.tokenizer.symbol())  # op
-            self.tokenizer.advance()
-            self.compile_term()
-        self.output_stream.write("</expression>\n")
+        self.compile_nested(CompilationEngine.EXPRESSION)
 
     def compile_term(self) -> None:
         """Compiles a term.
@@ -313,91 +418,166 @@ class CompilationEngine:
         to distinguish between the three possibilities. Any other token is not
         part of this term and should not be advanced over.
         """
-        self.output_stream.write("<term>\n")
-        if self.tokenizer.token_type() == "INT_CONST":
-            self.writeIntConst(self.tokenizer.int_val())
-            self.tokenizer.advance()
-        elif self.tokenizer.token_type() == "STRING_CONST":
-            self.writeStrConst(self.tokenizer.string_val())
-            self.tokenizer.advance()
-        elif (self.tokenizer.token_type() == "KEYWORD" and
-              self.tokenizer.keyword() in CompilationEngine.KEYWORD_CONSTANTS):
-            self.writeKeyword(self.tokenizer.keyword())
-            self.tokenizer.advance()
-        elif self.tokenizer.token_type() == "IDENTIFIER":
-            var_name = self.tokenizer.identifier()
-            self.tokenizer.advance()
-            if self.tokenizer.token_type() == "SYMBOL" and self.tokenizer.symbol() == "[":
-                # array
-                self.writeIdentifier(var_name)
-                self.writeSymbol(self.tokenizer.symbol())  # [
-                self.tokenizer.advance()
-                self.compile_expression()
-                self.writeSymbol(self.tokenizer.symbol())  # ]
-                self.tokenizer.advance()
-            elif (self.tokenizer.token_type() == "SYMBOL" and
-                  self.tokenizer.symbol() in ("(", ".")):
-                # subroutineCall:
-                self.compile_subroutine_call(var_name)
-            else:
-                # Simple variable
-                self.writeIdentifier(var_name)
-        elif self.tokenizer.token_type() == "SYMBOL" and self.tokenizer.symbol() == "(":
-            # ( expression )
-            self.writeSymbol(self.tokenizer.symbol())  # (
-            self.tokenizer.advance()
-            self.compile_expression()
-            self.writeSymbol(self.tokenizer.symbol())  # )
-            self.tokenizer.advance()
-        elif self.tokenizer.token_type() == "SYMBOL" and self.tokenizer.symbol() in CompilationEngine.UNARY_OP:
-            # Handle unaryOp term
-            self.writeSymbol(self.tokenizer.symbol())
-            self.tokenizer.advance()
-            self.compile_term()
-        else:
-            raise ValueError(
-                f"Unexpected token: {self.tokenizer.token_type()}")
-        self.output_stream.write("</term>\n")
+        self.compile_nested(CompilationEngine.TERM)
+
+    # The states of compile_nested: starting an expression or a term, ending
+    # a term, and the continuations of the constructs that contain a nested
+    # expression or term, which are resumed when it ends.
+    (EXPRESSION, TERM, END_TERM, AFTER_OPERAND, AFTER_INDEX, AFTER_PARENS,
+     AFTER_ARGUMENT, DONE) = range(8)
+
+    def compile_nested(self, state: int) -> None:
+        """Compiles an expression or a term, including everything nested in
+        it, without recursion: instead of calling itself for a nested
+        expression or term, it pushes the state to resume in when the nested
+        one ends onto an explicit stack, so the nesting depth is unbounded.
+        Jack operators have no precedence, so the operands of an expression
+        are simply parsed from left to right. The production of every term
+        is looked up in TERMS, and parsed in a state of its own.
+
+        Args:
+            state (int): EXPRESSION or TERM.
+        """
+        tokenizer = self.tokenizer
+        lookahead = tokenizer.lookahead
+        emitter = self.emitter
+        open_tag, close_tag = emitter.open_tag, emitter.close_tag
+        terminal = emitter.terminal
+        OPS, TERMS = CompilationEngine.OPS, CompilationEngine.TERMS
+        EXPRESSION, TERM, END_TERM = (
+            CompilationEngine.EXPRESSION, CompilationEngine.TERM,
+            CompilationEngine.END_TERM)
+        AFTER_OPERAND, AFTER_INDEX, AFTER_PARENS, AFTER_ARGUMENT = (
+            CompilationEngine.AFTER_OPERAND, CompilationEngine.AFTER_INDEX,
+            CompilationEngine.AFTER_PARENS, CompilationEngine.AFTER_ARGUMENT)
+        NAME, INTEGER, STRING, KEYWORD_CONSTANT, PARENS, UNARY = (
+            CompilationEngine.NAME, CompilationEngine.INTEGER,
+            CompilationEngine.STRING, CompilationEngine.KEYWORD_CONSTANT,
+            CompilationEngine.PARENS, CompilationEngine.UNARY)
+        stack = [CompilationEngine.DONE]
+        while True:
+            if state == TERM:
+                open_tag("term")
+                state = TERMS.get(lookahead())
+                if state is None:
+                    self.error("a term")
+            elif state == END_TERM:
+                close_tag("term")
+                state = stack.pop()
+            elif state == AFTER_OPERAND:
+                if lookahead() in OPS:
+                    terminal("symbol", tokenizer.symbol())  # op
+                    tokenizer.advance()
+                    stack.append(AFTER_OPERAND)
+                    state = TERM
+                else:
+                    close_tag("expression")
+                    state = stack.pop()
+            elif state == NAME:
+                name = tokenizer.identifier()
+                tokenizer.advance()
+                terminal("identifier", name)
+                symbol = lookahead()
+                state = END_TERM
+                if symbol == "[":
+                    terminal("symbol", symbol)
+                    tokenizer.advance()
+                    stack.append(AFTER_INDEX)
+                    state = EXPRESSION
+                elif symbol == "(" or symbol == ".":
+                    # subroutineCall
+                    if symbol == ".":
+                        terminal("symbol", symbol)
+                        tokenizer.advance()
+                        terminal("identifier", self.expect_identifier())
+                    terminal("symbol", self.expect("("))
+                    open_tag("expressionList")
+                    if lookahead() == ")":
+                        close_tag("expressionList")
+                        terminal("symbol", ")")
+                        tokenizer.advance()
+                    else:
+                        stack.append(AFTER_ARGUMENT)
+                        state = EXPRESSION
+            elif state == EXPRESSION:
+                open_tag("expression")
+                stack.append(AFTER_OPERAND)
+                state = TERM
+            elif state == INTEGER:
+                terminal("integerConstant", str(tokenizer.int_val()))
+                tokenizer.advance()
+                state = END_TERM
+            elif state == AFTER_ARGUMENT:
+                if lookahead() == ",":
+                    terminal("symbol", ",")
+                    tokenizer.advance()
+                    stack.append(AFTER_ARGUMENT)
+                    state = EXPRESSION
+                else:
+                    close_tag("expressionList")
+                    terminal("symbol", self.expect(")"))
+                    state = END_TERM
+            elif state == AFTER_INDEX:
+                terminal("symbol", self.expect("]"))
+                state = END_TERM
+            elif state == AFTER_PARENS:
+                terminal("symbol", self.expect(")"))
+                state = END_TERM
+            elif state == PARENS:
+                terminal("symbol", "(")
+                tokenizer.advance()
+                stack.append(AFTER_PARENS)
+                state = EXPRESSION
+            elif state == UNARY:
+                terminal("symbol", tokenizer.symbol())
+                tokenizer.advance()
+                stack.append(END_TERM)
+                state = TERM
+            elif state == KEYWORD_CONSTANT:
+                terminal("keyword", tokenizer.keyword())
+                tokenizer.advance()
+                state = END_TERM
+            elif state == STRING:
+                terminal("stringConstant", tokenizer.string_val())
+                tokenizer.advance()
+                state = END_TERM
+            else:  # DONE
+                return
 
     def compile_expression_list(self) -> None:
         """Compiles a (possibly empty) comma-separated list of expressions."""
         #     - expressionList: (expression (',' expression)* )? todo
         #  check if empty
-        self.output_stream.write("<expressionList>\n")
-        if (not (self.tokenizer.token_type() == "SYMBOL" and
-                 self.tokenizer.symbol() == ")")):
+        self.emitter.open_tag("expressionList")
+        if self.tokenizer.lookahead() != ")":
             self.compile_expression()
-            while (self.tokenizer.token_type() == "SYMBOL" and
-                   self.tokenizer.symbol() == ","):
-                self.writeSymbol(self.tokenizer.symbol())  # ,
-                self.tokenizer.advance()
+            while self.tokenizer.lookahead() == ",":
+                self.writeSymbol(self.expect(","))
                 self.compile_expression()
-        self.output_stream.write("</expressionList>\n")
+        self.emitter.close_tag("expressionList")
 
     def compile_type(self):
-        if self.tokenizer.token_type() == "KEYWORD":
+        tag = CompilationEngine.TYPES.get(self.tokenizer.lookahead())
+        if tag == "keyword":
             self.writeKeyword(self.tokenizer.keyword())  # 'int/char/boolean'
-        elif self.tokenizer.token_type() == "IDENTIFIER":
+        elif tag == "identifier":
             self.writeIdentifier(self.tokenizer.identifier())  # className
+        else:
+            self.error("a type")
+        self.tokenizer.advance()
 
     def compile_subroutine_call(self, identifier):
         self.writeIdentifier(identifier)
-        if self.tokenizer.symbol() == "(":
-            self.writeSymbol(self.tokenizer.symbol())  # (
-            self.tokenizer.advance()
+        symbol = self.tokenizer.lookahead()
+        if symbol == "(":
+            self.writeSymbol(self.expect("("))
             self.compile_expression_list()
-            self.writeSymbol(self.tokenizer.symbol())  # )
-            self.tokenizer.advance()
-        elif self.tokenizer.symbol() == ".":
-            self.writeSymbol(self.tokenizer.symbol())  # .
-            self.tokenizer.advance()
-            self.writeIdentifier(self.tokenizer.identifier())  # subroutineName
-            self.tokenizer.advance()
-            self.writeSymbol(self.tokenizer.symbol())  # (
-            self.tokenizer.advance()
+            self.writeSymbol(self.expect(")"))
+        elif symbol == ".":
+            self.writeSymbol(self.expect("."))
+            self.writeIdentifier(self.expect_identifier())  # subroutineName
+            self.writeSymbol(self.expect("("))
             self.compile_expression_list()
-            self.writeSymbol(self.tokenizer.symbol())  # )
-            self.tokenizer.advance()
+            self.writeSymbol(self.expect(")"))
         else:
-            raise ValueError(
-                f"Unexpected token: {self.tokenizer.symbol()}")
+            self.error("'(' or '.'")
@@ -0,0 +1,226 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import time
+
+from BuildCache import BuildCache, compiler_fingerprint
+from JackAnalyzer import (OUTPUT_SUFFIXES, analyze_path, collect_paths,
+                          default_cache_dir)
+
+
+class CompileRequestHandler(socketserver.StreamRequestHandler):
+    """Answers every line of a connection, which is a JSON request, with a
+    line of JSON.
+    """
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                response = self.server.respond(json.loads(line))
+            except (OSError, ValueError, TypeError, KeyError) as error:
+                response = {"ok": False, "error": str(error)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+            if self.server.stopping:
+                return
+
+
+class CompileServer(socketserver.UnixStreamServer):
+    """Serves compile requests over a Unix socket, keeping the compiler warm
+    between them: the modules are imported, the token pattern is compiled
+    and the build manifests are loaded only once, instead of on every run.
+
+    The protocol is a JSON object per line, both ways. A request is one of:
+
+        {"command": "compile", "path": PATH, "mode": "syntax",
+         "format": "xml", "optimize": 0, "stream": false, "force": false,
+         "cache_dir": null}
+        {"command": "ping"}
+        {"command": "shutdown"}
+
+    where everything but the command and the path is optional, with the
+    defaults of JackAnalyzer, and the mode is "syntax", "vm" or "tokens"
+    (see analyze_file). PATH is a .jack file or a directory, and its
+    files that are up to date in the build cache are not compiled again.
+    The response to a compile request reports every file:
+
+        {"ok": true, "failures": 0, "seconds": 0.004, "files": [
+            {"path": INPUT, "output": OUTPUT, "cached": false,
+             "error": null, "counts": {}}]}
+
+    where the error, if any, has a line per error, as JackAnalyzer reports
+    it. A request that cannot be served gets {"ok": false, "error": ...}.
+    Requests are served one at a time.
+    """
+
+    def __init__(self, socket_path: str) -> None:
+        """
+        Args:
+            socket_path (str): the path to listen on.
+        """
+        super().__init__(socket_path, CompileRequestHandler)
+        self.socket_path = socket_path
+        self.stopping = False
+        self.fingerprints = {}  # the compiler fingerprint of every option set
+        self.caches = {}  # the build cache of every directory and option set
+
+    def serve(self) -> None:
+        """Serves requests until a shutdown request."""
+        try:
+            while not self.stopping:
+                self.handle_request()
+        finally:
+            self.server_close()
+            os.unlink(self.socket_path)
+
+    def respond(self, request: dict) -> dict:
+        """
+        Args:
+            request (dict): a request, see the class docstring.
+
+        Returns:
+            dict: the response.
+        """
+        command = request["command"]
+        if command == "compile":
+            return self.compile(request)
+        if command == "ping":
+            return {"ok": True}
+        if command == "shutdown":
+            self.stopping = True
+            return {"ok": True}
+        raise ValueError(f"Unknown command: {command}")
+
+    def cache(self, cache_dir: str, *options: str) -> BuildCache:
+        """
+        Returns:
+            BuildCache: the build cache of the directory, for the compiler
+            with the given options, loaded once and then kept in memory.
+        """
+        if options not in self.fingerprints:
+            self.fingerprints[options] = compiler_fingerprint(*options)
+        key = (cache_dir, options)
+        if key not in self.caches:
+            self.caches[key] = BuildCache(cache_dir,
+                                          self.fingerprints[options])
+        return self.caches[key]
+
+    def compile(self, request: dict) -> dict:
+        """Compiles the files of a compile request that are out of date.
+
+        Returns:
+            dict: the response.
+        """
+        start = time.perf_counter()
+        path = os.path.abspath(request["path"])
+        mode = request.get("mode", "syntax")
+        output_format = request.get("format", "xml")
+        optimize = request.get("optimize", 0)
+        if not os.path.exists(path):
+            raise ValueError(f"No such file or directory: {path}")
+        if mode not in ("syntax", "vm", "tokens"):
+            raise ValueError(f"Unknown mode: {mode}")
+        if output_format not in OUTPUT_SUFFIXES:
+            raise ValueError(f"Unknown format: {output_format}")
+        if optimize not in (0, 1, 2):
+            raise ValueError(f"Unknown optimization level: {optimize}")
+        cache_dir = request.get("cache_dir")
+        cache = self.cache(
+            os.path.abspath(cache_dir) if cache_dir else
+            default_cache_dir(path), mode, output_format, str(optimize))
+        cache.force = bool(request.get("force", False))
+
+        files = []
+        failures = 0
+        for input_path, output_path in collect_paths(
+                path, mode, output_format):
+            cached = cache.is_up_to_date(input_path, output_path)
+            error, counts = None, {}
+            if not cached:
+                _, error, counts, _ = analyze_path(
+                    input_path, output_path,
+                    streaming=bool(request.get("stream", False)),
+                    output_format=output_format, mode=mode,
+                    optimize=optimize)
+                if error is None:
+                    cache.update(input_path, output_path)
+                else:
+                    cache.forget(input_path)
+                    failures += 1
+            files.append({"path": input_path, "output": output_path,
+                          "cached": cached, "error": error, "counts": counts})
+        cache.save()
+        return {"ok": True, "failures": failures,
+                "seconds": time.perf_counter() - start, "files": files}
+
+
+def send_request(socket_path: str, request: dict) -> dict:
+    """Sends a request to a CompileServer, and waits for its response.
+
+    Args:
+        socket_path (str): the path the server listens on.
+        request (dict): the request.
+
+    Returns:
+        dict: the response.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(request).encode() + b"\n")
+        with connection.makefile('rb') as responses:
+            return json.loads(responses.readline())
+
+
+def remove_stale_socket(socket_path: str) -> None:
+    """Removes the socket left behind by a server that is no longer
+    running.
+
+    Raises:
+        ValueError: if a server is still listening on the socket.
+    """
+    if not os.path.exists(socket_path):
+        return
+    try:
+        send_request(socket_path, {"command": "ping"})
+    except OSError:
+        os.unlink(socket_path)
+        return
+    raise ValueError(f"A server is already listening on {socket_path}")
+
+
+if "__main__" == __name__:
+    parser = argparse.ArgumentParser(
+        prog="CompileServer",
+        description="Serves Jack compile requests over a Unix socket, see "
+                    "CompileServer for the protocol.")
+    parser.add_argument("socket_path", help="the path of the Unix socket")
+    parser.add_argument(
+        "--send", metavar="REQUEST",
+        help="instead of serving, send a JSON request to the server that "
+             "listens on the socket, and print its response")
+    args = parser.parse_args()
+    if args.send is not None:
+        response = send_request(args.socket_path, json.loads(args.send))
+        print(json.dumps(response, indent=2))
+        sys.exit(0 if response.get("ok") and
+                 not response.get("failures") else 1)
+    try:
+        remove_stale_socket(args.socket_path)
+    except ValueError as error:
+        parser.error(str(error))
+    server = CompileServer(args.socket_path)
+    print(f"Serving on {args.socket_path}", file=sys.stderr)
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,181 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import json
+import typing
+
+# The non-terminals of the Jack grammar that appear in the parse tree.
+NON_TERMINALS = (
+    "class", "classVarDec", "subroutineDec", "parameterList",
+    "subroutineBody", "varDec", "statements", "letStatement", "ifStatement",
+    "whileStatement", "doStatement", "returnStatement", "expression", "term",
+    "expressionList")
+
+XML_ESCAPES = str.maketrans({'<': '&lt;', '>': '&gt;', '&': '&amp;'})
+
+
+def xml_escape(text: str) -> str:
+    """
+    Returns:
+        str: the text, with the characters that are special in XML escaped.
+    """
+    return text.translate(XML_ESCAPES)
+
+
+class Emitter:
+    """Receives the structure parsed by a CompilationEngine, as a sequence of
+    opened and closed non-terminals (e.g. "class", "statements") and the
+    terminals (tokens) between them, and writes it out in some format.
+    """
+
+    def open_tag(self, tag: str) -> None:
+        """Starts a non-terminal.
+
+        Args:
+            tag (str): the name of the non-terminal, e.g. "whileStatement".
+        """
+        raise NotImplementedError
+
+    def close_tag(self, tag: str) -> None:
+        """Ends the most recently started non-terminal.
+
+        Args:
+            tag (str): the name of the non-terminal.
+        """
+        raise NotImplementedError
+
+    def terminal(self, tag: str, text: str) -> None:
+        """Emits a terminal.
+
+        Args:
+            tag (str): the kind of the terminal, one of "keyword", "symbol",
+                "identifier", "integerConstant" and "stringConstant".
+            text (str): the terminal itself, unescaped.
+        """
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Writes out everything emitted so far."""
+
+
+class NullEmitter(Emitter):
+    """Discards everything, for when the input only needs to be parsed."""
+
+    def __init__(self, output_stream: typing.Optional[typing.TextIO] = None
+                 ) -> None:
+        """
+        Args:
+            output_stream (typing.TextIO): ignored.
+        """
+
+    def open_tag(self, tag: str) -> None:
+        pass
+
+    def close_tag(self, tag: str) -> None:
+        pass
+
+    def terminal(self, tag: str, text: str) -> None:
+        pass
+
+
+class BufferedEmitter(Emitter):
+    """An emitter that collects its output in memory, and writes it to the
+    output stream in large chunks.
+    """
+
+    BUFFER_SIZE = 1 << 16  # the number of fragments to collect per write
+
+    def __init__(self, output_stream: typing.TextIO) -> None:
+        """
+        Args:
+            output_stream (typing.TextIO): the stream to write the output to.
+        """
+        self.output_stream = output_stream
+        self.buffer = []
+
+    def write(self, fragment: str) -> None:
+        """Adds a fragment of output to the buffer, writing the buffer out if
+        it is full.
+
+        Args:
+            fragment (str): the fragment.
+        """
+        buffer = self.buffer
+        buffer.append(fragment)
+        if len(buffer) >= BufferedEmitter.BUFFER_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        self.output_stream.write("".join(self.buffer))
+        self.buffer.clear()
+
+
+class XMLEmitter(BufferedEmitter):
+    """Writes the parse tree as XML, one tag per line. The root element is
+    not followed by a newline.
+    """
+
+    OPEN_TAGS = {tag: f"<{tag}>\n" for tag in NON_TERMINALS}
+    CLOSE_TAGS = {tag: f"</{tag}>\n" for tag in NON_TERMINALS}
+
+    def __init__(self, output_stream: typing.TextIO) -> None:
+        """
+        Args:
+            output_stream (typing.TextIO): the stream to write the output to.
+        """
+        super().__init__(output_stream)
+        self.depth = 0
+        # the complete line of every terminal emitted so far
+        self.terminals = {}
+
+    def open_tag(self, tag: str) -> None:
+        self.depth += 1
+        self.write(XMLEmitter.OPEN_TAGS[tag])
+
+    def close_tag(self, tag: str) -> None:
+        self.depth -= 1
+        if self.depth:
+            self.write(XMLEmitter.CLOSE_TAGS[tag])
+        else:
+            self.write(f"</{tag}>")
+
+    def terminal(self, tag: str, text: str) -> None:
+        line = self.terminals.get((tag, text))
+        if line is None:
+            line = self.terminals[tag, text] = (
+                f"<{tag}> {xml_escape(text)} </{tag}>\n")
+        self.write(line)
+
+
+class JSONEmitter(BufferedEmitter):
+    """Writes the parse tree as compact JSON: a non-terminal is an object
+    mapping its name to the list of its children, and a terminal is an object
+    mapping its kind to its text, e.g.
+    {"term":[{"identifier":"x"}]}
+    """
+
+    def __init__(self, output_stream: typing.TextIO) -> None:
+        """
+        Args:
+            output_stream (typing.TextIO): the stream to write the output to.
+        """
+        super().__init__(output_stream)
+        self.first = True  # is the next element the first of its parent?
+
+    def open_tag(self, tag: str) -> None:
+        separator = "" if self.first else ","
+        self.write(f'{separator}{{"{tag}":[')
+        self.first = True
+
+    def close_tag(self, tag: str) -> None:
+        self.write("]}")
+        self.first = False
+
+    def terminal(self, tag: str, text: str) -> None:
+        separator = "" if self.first else ","
+        self.write(f'{separator}{{"{tag}":{json.dumps(text)}}}')
+        self.first = False
@@ -0,0 +1,293 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+# Jack integers are 16-bit two's complement words.
+WORD_BITS = 16
+MIN_INT, MAX_INT = -(1 << WORD_BITS - 1), (1 << WORD_BITS - 1) - 1
+TRUE, FALSE = -1, 0
+
+
+def to_word(value: int) -> int:
+    """
+    Returns:
+        int: the value, wrapped around to a signed 16-bit word.
+    """
+    return (value - MIN_INT) % (1 << WORD_BITS) + MIN_INT
+
+
+class Expression:
+    """A node of an expression tree. The code generator builds a tree for
+    every expression, so that it can be rewritten before it is written out.
+    """
+    __slots__ = ()
+
+    def is_pure(self) -> bool:
+        """
+        Returns:
+            bool: whether evaluating the expression has no side effects, so
+            that it can be dropped.
+        """
+        stack = [self]  # not recursive, as the tree may be deep
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Binary):
+                # "*" and "/" call Math.multiply and Math.divide, which may
+                # fail, e.g. on a division by zero, and which a program may
+                # replace
+                if node.op in "*/":
+                    return False
+                stack.append(node.left)
+                stack.append(node.right)
+            elif isinstance(node, Unary):
+                stack.append(node.operand)
+            elif isinstance(node, Code):
+                if any(instruction[0] == "call"
+                       for instruction in node.instructions):
+                    return False
+        return True
+
+
+class Constant(Expression):
+    """An integer constant, including the folded values of true and false."""
+    __slots__ = ("value",)
+
+    def __init__(self, value: int) -> None:
+        self.value = value
+
+
+class Code(Expression):
+    """A term that is not rewritten, e.g. a variable or a call, as the VM
+    instructions that push its value.
+    """
+    __slots__ = ("instructions",)
+
+    def __init__(self, instructions: typing.List[tuple]) -> None:
+        self.instructions = instructions
+
+
+class Unary(Expression):
+    """A unary operator, one of "-", "~", "^" and "#", applied to a term."""
+    __slots__ = ("op", "operand")
+
+    def __init__(self, op: str, operand: Expression) -> None:
+        self.op = op
+        self.operand = operand
+
+
+class Binary(Expression):
+    """A binary operator applied to two expressions."""
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op: str, left: Expression, right: Expression) -> None:
+        self.op = op
+        self.left = left
+        self.right = right
+
+
+def fold_unary(op: str, value: int) -> int:
+    """
+    Returns:
+        int: the value of the unary operator applied to the constant.
+    """
+    if op == '-':
+        return to_word(-value)
+    if op == '~':
+        return ~value
+    if op == '^':
+        return to_word(value << 1)
+    return value >> 1  # '#'
+
+
+def fold_binary(op: str, left: int, right: int) -> typing.Optional[int]:
+    """
+    Returns:
+        int: the value of the binary operator applied to the constants, or
+        None if it cannot be computed at compile time (a division by zero).
+    """
+    if op == '+':
+        return to_word(left + right)
+    if op == '-':
+        return to_word(left - right)
+    if op == '*':
+        return to_word(left * right)
+    if op == '/':
+        if right == 0:
+            return None
+        # Math.divide rounds towards zero
+        quotient = abs(left) // abs(right)
+        return to_word(quotient if (left < 0) == (right < 0) else -quotient)
+    if op == '&':
+        return left & right
+    if op == '|':
+        return left | right
+    if op == '<':
+        return TRUE if left < right else FALSE
+    if op == '>':
+        return TRUE if left > right else FALSE
+    return TRUE if left == right else FALSE  # '='
+
+
+def log2(value: int) -> typing.Optional[int]:
+    """
+    Returns:
+        int: the exponent of the value, if it is a positive power of two.
+    """
+    if value > 0 and value & (value - 1) == 0:
+        return value.bit_length() - 1
+    return None
+
+
+def is_non_negative(expression: Expression) -> bool:
+    """
+    Returns:
+        bool: whether the value of the expression is known to be >= 0.
+    """
+    # x & y is non-negative if either operand is, and #x if x is: it is
+    # enough to find a non-negative constant through these
+    stack = [expression]
+    while stack:
+        expression = stack.pop()
+        if isinstance(expression, Constant):
+            if expression.value >= 0:
+                return True
+        elif isinstance(expression, Binary) and expression.op == '&':
+            stack.append(expression.left)
+            stack.append(expression.right)
+        elif isinstance(expression, Unary) and expression.op == '#':
+            stack.append(expression.operand)
+    return False
+
+
+class ExpressionBuilder:
+    """Builds expression trees as they are parsed, without changing them."""
+
+    def __init__(self) -> None:
+        self.counts = {}  # the number of rewrites of every kind
+
+    def unary(self, op: str, operand: Expression) -> Expression:
+        """
+        Returns:
+            Expression: the unary operator applied to the operand.
+        """
+        return Unary(op, operand)
+
+    def binary(self, op: str, left: Expression,
+               right: Expression) -> Expression:
+        """
+        Returns:
+            Expression: the binary operator applied to the operands.
+        """
+        return Binary(op, left, right)
+
+
+class ExpressionOptimizer(ExpressionBuilder):
+    """Builds expression trees as they are parsed, and rewrites every node
+    as it is built, so that its operands are already optimized:
+    - constant subexpressions are folded, with 16-bit wraparound;
+    - multiplications by powers of two become chains of "^" (shift left),
+      and so do divisions of operands that are known to be non-negative,
+      with "#" (shift right), which would round negative operands the
+      wrong way;
+    - identities like x+0, x-0, x*1, x/1, x|0, ~~x and --x are removed, and
+      x*0 and x&0 become 0 when x has no side effects.
+    Every rewrite is counted in counts.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.counts.update(folded=0, reduced=0, simplified=0)
+
+    def rewrite(self, kind: str, expression: Expression) -> Expression:
+        """Counts a rewrite of the given kind, and returns its result."""
+        self.counts[kind] += 1
+        return expression
+
+    def shifts(self, op: str, operand: Expression, count: int) -> Expression:
+        """
+        Returns:
+            Expression: the operand, shifted count times with op.
+        """
+        for _ in range(count):
+            operand = self.unary(op, operand)
+        return operand
+
+    def unary(self, op: str, operand: Expression) -> Expression:
+        if isinstance(operand, Constant):
+            value = fold_unary(op, operand.value)
+            if op == '-' and operand.value > 0:
+                # negative literals are written the same way anyway
+                return Constant(value)
+            return self.rewrite("folded", Constant(value))
+        if (op in "-~" and isinstance(operand, Unary) and
+                operand.op == op):
+            return self.rewrite("simplified", operand.operand)
+        return Unary(op, operand)
+
+    def binary(self, op: str, left: Expression,
+               right: Expression) -> Expression:
+        left_value = left.value if isinstance(left, Constant) else None
+        right_value = right.value if isinstance(right, Constant) else None
+        if left_value is not None and right_value is not None:
+            value = fold_binary(op, left_value, right_value)
+            if value is not None:
+                return self.rewrite("folded", Constant(value))
+
+        if op == '+' or op == '-':
+            if right_value == 0:
+                return self.rewrite("simplified", left)
+            if left_value == 0:
+                if op == '+':
+                    return self.rewrite("simplified", right)
+                return self.rewrite("simplified", self.unary('-', right))
+            if (right_value is not None and isinstance(left, Binary) and
+                    left.op in "+-" and isinstance(left.right, Constant)):
+                # (x + a) + b is x + (a + b), and so on
+                offset = fold_binary(
+                    op, fold_binary(left.op, 0, left.right.value),
+                    right_value)
+                return self.rewrite("folded", self.offset(left.left, offset))
+        elif op == '*':
+            for value, other in ((right_value, left), (left_value, right)):
+                if value == 1:
+                    return self.rewrite("simplified", other)
+                if value == 0 and other.is_pure():
+                    return self.rewrite("simplified", Constant(0))
+                if value == -1:
+                    return self.rewrite("simplified", self.unary('-', other))
+                exponent = None if value is None else log2(value)
+                if exponent is not None:
+                    return self.rewrite(
+                        "reduced", self.shifts('^', other, exponent))
+        elif op == '/':
+            if right_value == 1:
+                return self.rewrite("simplified", left)
+            exponent = None if right_value is None else log2(right_value)
+            if exponent is not None and is_non_negative(left):
+                return self.rewrite(
+                    "reduced", self.shifts('#', left, exponent))
+        elif op == '&' or op == '|':
+            identity, zero = (TRUE, FALSE) if op == '&' else (FALSE, TRUE)
+            for value, other in ((right_value, left), (left_value, right)):
+                if value == identity:
+                    return self.rewrite("simplified", other)
+                if value == zero and other.is_pure():
+                    return self.rewrite("simplified", Constant(zero))
+        return Binary(op, left, right)
+
+    def offset(self, operand: Expression, value: int) -> Expression:
+        """
+        Returns:
+            Expression: the operand plus the constant, subtracting its
+            absolute value instead if it is negative.
+        """
+        if value == 0:
+            return operand
+        if value < 0 and value != MIN_INT:
+            return Binary('-', operand, Constant(-value))
+        return Binary('+', operand, Constant(value))
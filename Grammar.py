@@ -0,0 +1,179 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+from JackTokenizer import IDENTIFIER, INT_CONST, STRING_CONST
+
+# The Jack grammar of the JackTokenizer docstring, left-factored so that a
+# single token of lookahead decides every production. Groups are replaced by
+# helper rules, so every alternative is a plain sequence of symbols, each of
+# which may be optional (?) or repeated (*). Terminals are either quoted, or
+# one of the token kinds in TERMINAL_KINDS.
+RULES = """
+class: 'class' className '{' classVarDec* subroutineDec* '}'
+classVarDec: classVarKind type varName moreVarNames* ';'
+classVarKind: 'static' | 'field'
+moreVarNames: ',' varName
+type: 'int' | 'char' | 'boolean' | className
+subroutineDec: subroutineKind returnType subroutineName '(' parameterList ')' \
+subroutineBody
+subroutineKind: 'constructor' | 'function' | 'method'
+returnType: 'void' | type
+parameterList: parameters?
+parameters: type varName moreParameters*
+moreParameters: ',' type varName
+subroutineBody: '{' varDec* statements '}'
+varDec: 'var' type varName moreVarNames* ';'
+className: identifier
+subroutineName: identifier
+varName: identifier
+statements: statement*
+statement: letStatement | ifStatement | whileStatement | doStatement | \
+returnStatement
+letStatement: 'let' varName index? '=' expression ';'
+index: '[' expression ']'
+ifStatement: 'if' '(' expression ')' '{' statements '}' elseClause?
+elseClause: 'else' '{' statements '}'
+whileStatement: 'while' '(' expression ')' '{' statements '}'
+doStatement: 'do' subroutineCall ';'
+returnStatement: 'return' expression? ';'
+expression: term moreTerms*
+moreTerms: op term
+term: integerConstant | stringConstant | keywordConstant | \
+varName termSuffix? | '(' expression ')' | unaryOp term
+termSuffix: index | callSuffix
+subroutineCall: subroutineName callSuffix
+callSuffix: '(' expressionList ')' | '.' subroutineName '(' expressionList ')'
+expressionList: arguments?
+arguments: expression moreArguments*
+moreArguments: ',' expression
+op: '+' | '-' | '*' | '/' | '&' | '|' | '<' | '>' | '='
+unaryOp: '-' | '~' | '^' | '#'
+keywordConstant: 'true' | 'false' | 'null' | 'this'
+"""
+
+# The terminals that stand for any token of a kind.
+TERMINAL_KINDS = {"identifier": IDENTIFIER, "integerConstant": INT_CONST,
+                  "stringConstant": STRING_CONST}
+
+# A lookahead key, as returned by JackTokenizer.lookahead(): a keyword or a
+# symbol is its own key, and any other token is keyed by its kind.
+Key = typing.Union[str, int]
+
+
+def parse_rules(text: str) -> typing.Dict[str, typing.List[str]]:
+    """
+    Args:
+        text (str): rules in the format of RULES.
+
+    Returns:
+        dict: the alternatives of every rule, by its name.
+    """
+    rules = {}
+    for line in text.replace("\\\n", "").strip().splitlines():
+        name, alternatives = line.split(":", 1)
+        rules[name] = [alternative.strip()
+                       for alternative in alternatives.split(" | ")]
+    return rules
+
+
+GRAMMAR = parse_rules(RULES)
+
+
+def symbol_first(symbol: str, first: typing.Dict[str, typing.Set[Key]],
+                 nullable: typing.Set[str]) -> typing.Tuple[set, bool]:
+    """
+    Args:
+        symbol (str): a symbol of an alternative, e.g. "'('", "identifier"
+            or "varDec*".
+        first (dict): the FIRST sets of the rules known so far.
+        nullable (set): the rules known so far to derive the empty sequence.
+
+    Returns:
+        tuple: the FIRST set of the symbol, and whether it can be empty.
+    """
+    optional = symbol[-1] in "?*"
+    if optional:
+        symbol = symbol[:-1]
+    if symbol[0] == "'":
+        return {symbol[1:-1]}, optional
+    if symbol in TERMINAL_KINDS:
+        return {TERMINAL_KINDS[symbol]}, optional
+    return first[symbol], optional or symbol in nullable
+
+
+def sequence_first(alternative: str, first: typing.Dict[str, typing.Set[Key]],
+                   nullable: typing.Set[str]) -> typing.Tuple[set, bool]:
+    """
+    Returns:
+        tuple: the FIRST set of a sequence of symbols, and whether it can be
+        empty.
+    """
+    keys = set()
+    for symbol in alternative.split():
+        symbol_keys, empty = symbol_first(symbol, first, nullable)
+        keys |= symbol_keys
+        if not empty:
+            return keys, False
+    return keys, True
+
+
+def first_sets(grammar: typing.Dict[str, typing.List[str]]
+               ) -> typing.Tuple[typing.Dict[str, typing.FrozenSet[Key]],
+                                 typing.Set[str]]:
+    """Computes the FIRST set of every rule, by iterating to a fixpoint.
+
+    Returns:
+        tuple: the FIRST set of every rule, and the rules that derive the
+        empty sequence.
+    """
+    first = {name: set() for name in grammar}
+    nullable = set()
+    changed = True
+    while changed:
+        changed = False
+        for name, alternatives in grammar.items():
+            for alternative in alternatives:
+                keys, empty = sequence_first(alternative, first, nullable)
+                if not keys <= first[name]:
+                    first[name] |= keys
+                    changed = True
+                if empty and name not in nullable:
+                    nullable.add(name)
+                    changed = True
+    return {name: frozenset(keys) for name, keys in first.items()}, nullable
+
+
+FIRST, NULLABLE = first_sets(GRAMMAR)
+
+
+def dispatch_table(rule: str, actions: typing.Dict[str, typing.Any]
+                   ) -> typing.Dict[Key, typing.Any]:
+    """Builds the LL(1) parsing table of a rule: for every lookahead key
+    that can start the rule, the action of the alternative it starts.
+
+    Args:
+        rule (str): the name of a rule of GRAMMAR.
+        actions (dict): the action of every alternative of the rule, by its
+            text.
+
+    Returns:
+        dict: the action to take, by lookahead key.
+    """
+    if set(actions) != set(GRAMMAR[rule]):
+        raise ValueError(f"The actions of {rule} do not match its "
+                         f"alternatives: {sorted(actions)}")
+    table = {}
+    for alternative, action in actions.items():
+        keys, _ = sequence_first(alternative, FIRST, NULLABLE)
+        for key in keys:
+            if key in table:
+                raise ValueError(f"The grammar is not LL(1): {key!r} starts "
+                                 f"more than one alternative of {rule}")
+            table[key] = action
+    return table
@@ -0,0 +1,242 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import bisect
+import io
+import re
+import typing
+
+import JackAST
+from CompilationEngine import CompilationEngine
+from Emitter import XMLEmitter
+from JackTokenizer import JackTokenizer
+
+# What may follow the last token of a member without changing how the text
+# after it is scanned: whitespace, and comments that are closed, including
+# the newline that ends a "//" comment.
+CLEAN_TAIL = re.compile(r"(?:\s|//[^\n]*\n|/\*[\s\S]*?\*/)*")
+
+# The number of tokens of the class before its first member: 'class',
+# its name and '{'.
+HEADER_TOKENS = 3
+
+
+def count_tokens(node: JackAST.Node) -> int:
+    """
+    Returns:
+        int: the number of tokens in the tree.
+    """
+    count = 0
+    stack = [node]
+    while stack:
+        for child in stack.pop().children:
+            if isinstance(child, JackAST.Token):
+                count += 1
+            else:
+                stack.append(child)
+    return count
+
+
+def xml_fragment(member: JackAST.Node) -> str:
+    """
+    Returns:
+        str: the XML of a member of a class, as it appears in the XML of
+        the class.
+    """
+    output = io.StringIO()
+    emitter = XMLEmitter(output)
+    emitter.depth = 1  # inside the class
+    JackAST.emit(member, emitter)
+    return output.getvalue()
+
+
+class IncrementalParser:
+    """Keeps the parse tree and the XML of a class up to date as its source
+    is edited, for editors that reparse on every keystroke.
+
+    The class is split into its members, the classVarDec and subroutineDec
+    nodes, each of which owns its source from its first token up to the
+    first token of the next member. An edit inside a single member re-lexes
+    and reparses only that member's source, and splices the resulting
+    members (there may be none, or several) into the tree and the output.
+    Every other edit is applied with a full parse: edits of the class
+    header and of its closing brace, edits across members, and edits whose
+    source does not parse into whole members, e.g. because they change how
+    the braces nest, or open a comment or a string that runs past the
+    member.
+    """
+
+    def __init__(self, source: str) -> None:
+        """
+        Args:
+            source (str): the source of the class.
+
+        Raises:
+            ValueError: if the source does not parse, see parse.
+        """
+        self.source = source
+        self.tree = None  # the parse tree, if the source parses
+        self.bounds = []  # the first offset of every member, and of '}'
+        self.header = self.footer = ""  # the XML around the members
+        self.fragments = []  # the XML of every member
+        self.full_parses = 0
+        self.partial_parses = 0
+        self.parse()
+
+    def parse(self) -> None:
+        """Parses the whole source.
+
+        Raises:
+            ValueError: if it does not parse, e.g. a JackSyntaxError. The
+                parser then has no tree until an edit makes it parse.
+        """
+        self.full_parses += 1
+        self.tree = None
+        tokenizer = JackTokenizer(io.StringIO(self.source))
+        tree = CompilationEngine(tokenizer, None).parse_class()
+        members = tree.children[HEADER_TOKENS:-1]
+        self.bounds = []
+        index = HEADER_TOKENS
+        for member in members:
+            self.bounds.append(tokenizer.starts[index])
+            index += count_tokens(member)
+        self.bounds.append(tokenizer.starts[index])
+
+        header = io.StringIO()
+        emitter = XMLEmitter(header)
+        emitter.open_tag("class")
+        for token in tree.children[:HEADER_TOKENS]:
+            emitter.terminal(token.TAG, token.text)
+        emitter.flush()
+        self.header = header.getvalue()
+        footer = io.StringIO()
+        emitter = XMLEmitter(footer)
+        emitter.depth = 1
+        emitter.terminal("symbol", "}")
+        emitter.close_tag("class")
+        emitter.flush()
+        self.footer = footer.getvalue()
+        self.fragments = [xml_fragment(member) for member in members]
+        self.tree = tree
+
+    def edit(self, start: int, end: int, text: str) -> bool:
+        """Replaces a range of the source, and updates the tree and the
+        output.
+
+        Args:
+            start (int): the offset of the first character replaced.
+            end (int): the offset after the last character replaced.
+            text (str): the replacement.
+
+        Returns:
+            bool: True if only a member was reparsed, False if the whole
+            class was.
+
+        Raises:
+            ValueError: if the edited source does not parse.
+        """
+        if not 0 <= start <= end <= len(self.source):
+            raise ValueError(f"Invalid edit range: {start}-{end}")
+        self.source = self.source[:start] + text + self.source[end:]
+        member = bisect.bisect_right(self.bounds, start) - 1
+        if self.tree is None or not 0 <= member < len(self.fragments) or \
+                end > self.bounds[member + 1]:
+            self.parse()
+            return False
+        delta = len(text) - (end - start)
+        parsed = self.parse_members(self.bounds[member],
+                                    self.bounds[member + 1] + delta)
+        if parsed is None:
+            self.parse()
+            return False
+        members, starts = parsed
+        children = self.tree.children
+        position = HEADER_TOKENS + member
+        children[position:position + 1] = members
+        if not self.in_order(children[HEADER_TOKENS:-1]):
+            self.parse()
+            return False
+        self.partial_parses += 1
+        self.bounds[member:] = starts + [
+            bound + delta for bound in self.bounds[member + 1:]]
+        self.fragments[member:member + 1] = [
+            xml_fragment(new_member) for new_member in members]
+        return True
+
+    def parse_members(self, start: int, end: int) -> typing.Optional[
+            typing.Tuple[typing.List[JackAST.Node], typing.List[int]]]:
+        """Lexes and parses a range of the source as a sequence of whole
+        members.
+
+        Returns:
+            tuple: the members, and the offset of the first token of every
+            one of them, or None if the range is not a sequence of members
+            that leaves the source after it as it was scanned.
+        """
+        source = self.source
+        tokenizer = JackTokenizer(io.StringIO(""))
+        tokenizer.line = source.count("\n", 0, start) + 1
+        tokenizer.line_start = source.rfind("\n", 0, start) + 1
+        region = source[start:end]
+        try:
+            tokenizer.scan(region, start)
+        except ValueError:
+            return None
+        count = len(tokenizer.ids)
+        tail = 0
+        if count:
+            tail = tokenizer.starts[count - 1] - start + len(
+                tokenizer.lexemes[tokenizer.ids[count - 1]])
+        if CLEAN_TAIL.fullmatch(region, tail) is None:
+            return None
+
+        builder = JackAST.ASTBuilder()
+        builder.open_tag("class")
+        engine = CompilationEngine(tokenizer, None, builder)
+        starts = []
+        try:
+            while tokenizer.token_index < count:
+                starts.append(tokenizer.starts[tokenizer.token_index])
+                key = tokenizer.lookahead()
+                if key in CompilationEngine.CLASS_VAR_DEC:
+                    engine.compile_class_var_dec()
+                elif key in CompilationEngine.SUBROUTINE_DEC:
+                    engine.compile_subroutine()
+                else:
+                    return None
+        except (ValueError, IndexError):  # a syntax error, or no more tokens
+            return None
+        if engine.diagnostics:
+            return None
+        return builder.root.children, starts
+
+    @staticmethod
+    def in_order(members: typing.List[JackAST.Node]) -> bool:
+        """
+        Returns:
+            bool: whether all the classVarDec members come before all the
+            subroutineDec members, as the grammar requires.
+        """
+        seen_subroutine = False
+        for member in members:
+            if isinstance(member, JackAST.SubroutineDec):
+                seen_subroutine = True
+            elif seen_subroutine:
+                return False
+        return True
+
+    def output(self) -> str:
+        """
+        Returns:
+            str: the XML of the class, as JackAnalyzer writes it.
+
+        Raises:
+            ValueError: if the source does not parse.
+        """
+        if self.tree is None:
+            raise ValueError("The source does not parse")
+        return self.header + "".join(self.fragments) + self.footer
@@ -0,0 +1,230 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import contextlib
+import time
+import typing
+
+import JackAST
+from Emitter import Emitter, NullEmitter
+
+
+class Stats:
+    """Collects statistics about the analysis of a single file: the time
+    spent in every phase, the number of tokens, lines and nodes, and
+    optionally the cumulative time spent in every compile_* grammar rule.
+
+    Every hook is installed explicitly, by wrapping the object it measures,
+    so nothing is measured (or slowed down) unless it is asked for; NullStats
+    has the same interface and measures nothing.
+    """
+
+    def __init__(self, rule_timing: bool = False) -> None:
+        """
+        Args:
+            rule_timing (bool): whether instrument() times the grammar rules.
+        """
+        self.rule_timing = rule_timing
+        self.phases = {}  # the seconds spent in every phase
+        self.counts = {}  # the number of tokens, lines and nodes
+        self.rules = {}  # the calls and the seconds of every grammar rule
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[None]:
+        """Times the code in the with block as the named phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name: str, number: int) -> None:
+        self.counts[name] = self.counts.get(name, 0) + number
+
+    def reader(self, stream: typing.IO) -> typing.IO:
+        """
+        Returns:
+            typing.IO: the stream, with its reads timed as the "read" phase.
+        """
+        return TimedStream(stream, self, "read")
+
+    def writer(self, stream: typing.IO) -> typing.IO:
+        """
+        Returns:
+            typing.IO: the stream, with its writes timed as the "write"
+            phase.
+        """
+        return TimedStream(stream, self, "write")
+
+    def emitter(self, emitter: Emitter) -> Emitter:
+        """
+        Returns:
+            Emitter: the emitter, counting the tokens and the nodes that go
+            through it.
+        """
+        return CountingEmitter(emitter, self)
+
+    def count_tree(self, tree) -> None:
+        """Counts the tokens and the nodes of a JackAST tree."""
+        JackAST.emit(tree, self.emitter(NullEmitter()))
+
+    def instrument(self, engine: typing.Any) -> None:
+        """Wraps every compile_* method of a compilation engine with a timer,
+        if rule timing is on. The time of a rule includes the rules it
+        calls, but a rule that is active already (through recursion) is only
+        timed once.
+        """
+        if not self.rule_timing:
+            return
+        for name in dir(type(engine)):
+            if name.startswith("compile_"):
+                setattr(engine, name, self.timed(name, getattr(engine, name)))
+
+    def timed(self, name: str, method: typing.Callable) -> typing.Callable:
+        """
+        Returns:
+            callable: the method, timed as the named rule.
+        """
+        entry = self.rules.setdefault(name, [0, 0.0])
+        active = [False]
+        perf_counter = time.perf_counter
+
+        def timed_method(*args, **kwargs):
+            entry[0] += 1
+            if active[0]:
+                return method(*args, **kwargs)
+            active[0] = True
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                entry[1] += perf_counter() - start
+                active[0] = False
+        return timed_method
+
+    def as_dict(self) -> dict:
+        """
+        Returns:
+            dict: the statistics, ready to be written as JSON.
+        """
+        result = {"phases": self.phases, "counts": self.counts}
+        if self.rule_timing:
+            result["rules"] = {
+                name: {"calls": calls, "seconds": seconds}
+                for name, (calls, seconds) in self.rules.items()}
+        return result
+
+
+class NullStats(Stats):
+    """Measures nothing, at no cost: every hook returns what it is given."""
+
+    def __init__(self) -> None:
+        super().__init__()
+
+    def phase(self, name: str) -> typing.ContextManager:
+        return contextlib.nullcontext()
+
+    def count(self, name: str, number: int) -> None:
+        pass
+
+    def reader(self, stream: typing.IO) -> typing.IO:
+        return stream
+
+    def writer(self, stream: typing.IO) -> typing.IO:
+        return stream
+
+    def emitter(self, emitter: Emitter) -> Emitter:
+        return emitter
+
+    def count_tree(self, tree) -> None:
+        pass
+
+    def instrument(self, engine: typing.Any) -> None:
+        pass
+
+
+NULL_STATS = NullStats()
+
+
+class TimedStream:
+    """A file object whose reads or writes are timed as a phase of a Stats.
+    Everything else is passed through to the wrapped file object.
+    """
+
+    def __init__(self, stream: typing.IO, stats: Stats, phase: str) -> None:
+        self.stream = stream
+        self.stats = stats
+        self.phase = phase
+
+    def read(self, *args) -> typing.AnyStr:
+        start = time.perf_counter()
+        data = self.stream.read(*args)
+        self.stats.add_time(self.phase, time.perf_counter() - start)
+        return data
+
+    def write(self, data: typing.AnyStr) -> int:
+        start = time.perf_counter()
+        written = self.stream.write(data)
+        self.stats.add_time(self.phase, time.perf_counter() - start)
+        return written
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self.stream, name)
+
+
+class CountingEmitter(Emitter):
+    """Passes everything on to another emitter, counting the tokens and the
+    nodes.
+    """
+
+    def __init__(self, emitter: Emitter, stats: Stats) -> None:
+        self.emitter = emitter
+        self.stats = stats
+        self.tokens = 0
+        self.nodes = 0
+
+    def open_tag(self, tag: str) -> None:
+        self.nodes += 1
+        self.emitter.open_tag(tag)
+
+    def close_tag(self, tag: str) -> None:
+        self.emitter.close_tag(tag)
+
+    def terminal(self, tag: str, text: str) -> None:
+        self.tokens += 1
+        self.emitter.terminal(tag, text)
+
+    def flush(self) -> None:
+        self.emitter.flush()
+        self.stats.count("tokens", self.tokens)
+        self.stats.count("nodes", self.nodes)
+        self.tokens = self.nodes = 0
+
+
+def summarize(reports: typing.Iterable[dict]) -> dict:
+    """
+    Args:
+        reports (iterable): the statistics of files, as returned by
+            Stats.as_dict().
+
+    Returns:
+        dict: the statistics of all the files together.
+    """
+    total = {"phases": {}, "counts": {}}
+    for report in reports:
+        for section in ("phases", "counts"):
+            for name, value in report[section].items():
+                total[section][name] = total[section].get(name, 0) + value
+        for name, rule in report.get("rules", {}).items():
+            entry = total.setdefault("rules", {}).setdefault(
+                name, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += rule["calls"]
+            entry["seconds"] += rule["seconds"]
+    return total
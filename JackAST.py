@@ -0,0 +1,362 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+from Emitter import Emitter, NON_TERMINALS
+
+
+class Node:
+    """A non-terminal of the parse tree. Every non-terminal of the grammar has
+    its own subclass, whose TAG is the name of the non-terminal.
+    """
+    __slots__ = ("children",)
+    TAG = None
+
+    def __init__(self, children: typing.Optional[list] = None) -> None:
+        """
+        Args:
+            children (list): the child nodes and tokens, in order.
+        """
+        self.children = [] if children is None else children
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.children == other.children
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.children!r})"
+
+
+class Token:
+    """A terminal of the parse tree. Every kind of terminal has its own
+    subclass, whose TAG is the name of the kind. Tokens are shared between
+    all the places in a tree where they appear, and must not be changed.
+    """
+    __slots__ = ("text",)
+    TAG = None
+
+    def __init__(self, text: str) -> None:
+        """
+        Args:
+            text (str): the terminal itself, e.g. a keyword or a symbol.
+        """
+        self.text = text
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.text == other.text
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.text!r})"
+
+
+class Class(Node):
+    __slots__ = ()
+    TAG = "class"
+
+
+class ClassVarDec(Node):
+    __slots__ = ()
+    TAG = "classVarDec"
+
+
+class SubroutineDec(Node):
+    __slots__ = ()
+    TAG = "subroutineDec"
+
+
+class ParameterList(Node):
+    __slots__ = ()
+    TAG = "parameterList"
+
+
+class SubroutineBody(Node):
+    __slots__ = ()
+    TAG = "subroutineBody"
+
+
+class VarDec(Node):
+    __slots__ = ()
+    TAG = "varDec"
+
+
+class Statements(Node):
+    __slots__ = ()
+    TAG = "statements"
+
+
+class LetStatement(Node):
+    __slots__ = ()
+    TAG = "letStatement"
+
+
+class IfStatement(Node):
+    __slots__ = ()
+    TAG = "ifStatement"
+
+
+class WhileStatement(Node):
+    __slots__ = ()
+    TAG = "whileStatement"
+
+
+class DoStatement(Node):
+    __slots__ = ()
+    TAG = "doStatement"
+
+
+class ReturnStatement(Node):
+    __slots__ = ()
+    TAG = "returnStatement"
+
+
+class Expression(Node):
+    __slots__ = ()
+    TAG = "expression"
+
+
+class Term(Node):
+    __slots__ = ()
+    TAG = "term"
+
+
+class ExpressionList(Node):
+    __slots__ = ()
+    TAG = "expressionList"
+
+
+class Keyword(Token):
+    __slots__ = ()
+    TAG = "keyword"
+
+
+class Symbol(Token):
+    __slots__ = ()
+    TAG = "symbol"
+
+
+class Identifier(Token):
+    __slots__ = ()
+    TAG = "identifier"
+
+
+class IntegerConstant(Token):
+    __slots__ = ()
+    TAG = "integerConstant"
+
+
+class StringConstant(Token):
+    __slots__ = ()
+    TAG = "stringConstant"
+
+
+NODE_TYPES = {node_type.TAG: node_type for node_type in (
+    Class, ClassVarDec, SubroutineDec, ParameterList, SubroutineBody, VarDec,
+    Statements, LetStatement, IfStatement, WhileStatement, DoStatement,
+    ReturnStatement, Expression, Term, ExpressionList)}
+TOKEN_TYPES = {token_type.TAG: token_type for token_type in (
+    Keyword, Symbol, Identifier, IntegerConstant, StringConstant)}
+
+
+class ASTBuilder(Emitter):
+    """An emitter that builds the parse tree in memory."""
+
+    def __init__(self) -> None:
+        self.root = None
+        self.stack = []  # the non-terminals that are open
+        self.tokens = {}  # the token of every terminal seen so far
+
+    def open_tag(self, tag: str) -> None:
+        node = NODE_TYPES[tag]()
+        if self.stack:
+            self.stack[-1].children.append(node)
+        else:
+            self.root = node
+        self.stack.append(node)
+
+    def close_tag(self, tag: str) -> None:
+        self.stack.pop()
+
+    def terminal(self, tag: str, text: str) -> None:
+        token = self.tokens.get((tag, text))
+        if token is None:
+            token = self.tokens[tag, text] = TOKEN_TYPES[tag](text)
+        self.stack[-1].children.append(token)
+
+
+def emit(tree: Node, emitter: Emitter) -> None:
+    """Walks the tree and replays it into the emitter, then flushes it. The
+    walk is iterative, so it works at any depth.
+
+    Args:
+        tree (Node): the tree to emit.
+        emitter (Emitter): the emitter.
+    """
+    open_tag, close_tag = emitter.open_tag, emitter.close_tag
+    terminal = emitter.terminal
+    open_tag(tree.TAG)
+    stack = [(tree, iter(tree.children))]
+    while stack:
+        node, children = stack[-1]
+        for child in children:
+            if isinstance(child, Token):
+                terminal(child.TAG, child.text)
+            else:
+                open_tag(child.TAG)
+                stack.append((child, iter(child.children)))
+                break
+        else:
+            stack.pop()
+            close_tag(node.TAG)
+    emitter.flush()
+
+
+# The binary format: MAGIC, then the string table (the number of strings,
+# then every string as its UTF-8 length and bytes), then the tree in
+# preorder: an opcode per node, where the token opcodes are followed by the
+# index of the token's text in the string table, and CLOSE ends the children
+# of the last open non-terminal. Numbers are unsigned LEB128 varints.
+MAGIC = b"JAST\x01"
+_TOKEN_TAGS = ("keyword", "symbol", "identifier", "integerConstant",
+               "stringConstant")
+_NODE_OPCODES = {tag: opcode for opcode, tag in enumerate(NON_TERMINALS)}
+_TOKEN_OPCODES = {tag: len(NON_TERMINALS) + opcode
+                  for opcode, tag in enumerate(_TOKEN_TAGS)}
+_CLOSE = 255
+_OPCODE_TYPES = ([NODE_TYPES[tag] for tag in NON_TERMINALS] +
+                 [TOKEN_TYPES[tag] for tag in _TOKEN_TAGS])
+
+
+def _write_varint(output: bytearray, number: int) -> None:
+    while number > 0x7f:
+        output.append(number & 0x7f | 0x80)
+        number >>= 7
+    output.append(number)
+
+
+def dumps(tree: Node) -> bytes:
+    """
+    Returns:
+        bytes: the tree, serialized to the binary format.
+    """
+    strings = {}
+    body = bytearray()
+    stack = [iter((tree,))]
+    while stack:
+        for child in stack[-1]:
+            if isinstance(child, Token):
+                body.append(_TOKEN_OPCODES[child.TAG])
+                index = strings.get(child.text)
+                if index is None:
+                    index = strings[child.text] = len(strings)
+                _write_varint(body, index)
+            else:
+                body.append(_NODE_OPCODES[child.TAG])
+                stack.append(iter(child.children))
+                break
+        else:
+            stack.pop()
+            body.append(_CLOSE)
+    body.pop()  # the CLOSE of the iterator around the root
+
+    output = bytearray(MAGIC)
+    _write_varint(output, len(strings))
+    for string in strings:
+        encoded = string.encode()
+        _write_varint(output, len(encoded))
+        output += encoded
+    output += body
+    return bytes(output)
+
+
+def loads(data: bytes) -> Node:
+    """
+    Returns:
+        Node: the tree, deserialized from the binary format.
+
+    Raises:
+        ValueError: if the data is not a whole serialized tree, e.g. because
+            it was truncated.
+    """
+    if not data.startswith(MAGIC):
+        raise ValueError("Not a serialized Jack parse tree")
+    try:
+        return _read_tree(data)
+    except IndexError:  # read past the end of the data
+        raise ValueError("Truncated serialized Jack parse tree") from None
+
+
+def _read_tree(data: bytes) -> Node:
+    """Deserializes the tree after MAGIC, see loads."""
+    position = len(MAGIC)
+
+    def read_varint() -> int:
+        nonlocal position
+        number, shift = 0, 0
+        while True:
+            byte = data[position]
+            position += 1
+            number |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return number
+            shift += 7
+
+    strings = []
+    for _ in range(read_varint()):
+        length = read_varint()
+        strings.append(data[position:position + length].decode())
+        position += length
+    if position > len(data):
+        raise IndexError(position)
+    tokens = {}  # the token of every terminal seen so far
+
+    first_token = len(NON_TERMINALS)
+    root = None
+    stack = []
+    end = len(data)
+    while position < end:
+        opcode = data[position]
+        position += 1
+        if opcode == _CLOSE:
+            stack.pop()
+        elif opcode >= first_token:
+            key = (opcode, read_varint())
+            token = tokens.get(key)
+            if token is None:
+                token = tokens[key] = _OPCODE_TYPES[opcode](strings[key[1]])
+            stack[-1].children.append(token)
+        else:
+            node = _OPCODE_TYPES[opcode]()
+            if stack:
+                stack[-1].children.append(node)
+            else:
+                root = node
+            stack.append(node)
+    if root is None or stack:
+        raise ValueError("Truncated serialized Jack parse tree")
+    return root
+
+
+def dump(tree: Node, output_stream: typing.BinaryIO) -> None:
+    """Serializes the tree to the binary format.
+
+    Args:
+        tree (Node): the tree.
+        output_stream (typing.BinaryIO): the stream to write it to.
+    """
+    output_stream.write(dumps(tree))
+
+
+def load(input_stream: typing.BinaryIO) -> Node:
+    """Deserializes a tree from the binary format.
+
+    Args:
+        input_stream (typing.BinaryIO): the stream to read it from.
+
+    Returns:
+        Node: the tree.
+    """
+    return loads(input_stream.read())
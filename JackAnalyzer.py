@@ -5,49 +5,809 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import concurrent.futures
+import functools
+import io
+import json
 import os
+import queue
+import re
 import sys
+import tempfile
+import threading
+import time
 import typing
+import JackAST
+from BuildCache import BuildCache, compiler_fingerprint, file_hash
 from CompilationEngine import CompilationEngine
-from JackTokenizer import JackTokenizer
-
-
-def write_tokens(token_type, tokenizer, file):
-    if token_type == "KEYWORD":
-        file.write(f"<keyword> {tokenizer.keyword()} </keyword>\n")
-    elif token_type == "SYMBOL":
-        file.write(f"<symbol> {tokenizer.symbol()} </symbol>\n")
-    elif token_type == "IDENTIFIER":
-        file.write(f"<identifier> {tokenizer.identifier()} </identifier>\n")
-    elif token_type == "INT_CONST":
-        file.write(
-            f"<integerConstant> {tokenizer.int_val()} </integerConstant>\n")
-    elif token_type == "STRING_CONST":
-        file.write(
-            f"<stringConstant> {tokenizer.string_val()} </stringConstant>\n")
+from Emitter import JSONEmitter, NullEmitter, XMLEmitter, xml_escape
+from Instrumentation import NULL_STATS, Stats, summarize
+from JackTokenizer import (INT_CONST, STRING_CONST, SYMBOL,
+                           JackTokenizer, StreamingJackTokenizer,
+                           scan_lexemes)
+from PeepholeOptimizer import PeepholeOptimizer
+from VMCompilationEngine import VMCompilationEngine
+from VMWriter import VMWriter
+from WholeProgram import Program
+
+# The emitter and the output file suffix of every output format. The "ast"
+# format is the binary serialization of the parse tree, see JackAST.
+EMITTERS = {"xml": XMLEmitter, "json": JSONEmitter, "none": NullEmitter}
+OUTPUT_SUFFIXES = {"xml": "Q.xml", "json": "Q.json", "ast": "Q.ast",
+                   "none": None}
+BINARY_FORMATS = {"ast"}
+# The permissions of new files, which mkstemp does not apply to the
+# temporary output files.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+# The line of a token in the token stream (T.xml), by the token's kind, as
+# in JackTokenizer: the kinds are small ints, so this is a plain tuple.
+TOKEN_TEMPLATES = ("<keyword> %s </keyword>\n", "<symbol> %s </symbol>\n",
+                   "<identifier> %s </identifier>\n",
+                   "<integerConstant> %s </integerConstant>\n",
+                   "<stringConstant> %s </stringConstant>\n")
+TOKENS_PER_WRITE = 1 << 16  # the number of tokens to join per write
+# An integer constant, in a newline-separated list, that has leading zeros.
+LEADING_ZERO = re.compile(r"^0\d", re.MULTILINE)
+
+
+def write_tokens(input_text: str, output_file: typing.TextIO) -> int:
+    """Writes the token stream of a file, as the <tokens> element of T.xml,
+    straight from the scanner, without parsing it: the lexemes are scanned
+    in bulk, the line of every distinct lexeme is made once from its kind's
+    template, and the lines of the tokens are joined and written in large
+    batches.
+
+    Args:
+        input_text (str): the content of the file.
+        output_file (typing.TextIO): the file to write to.
+
+    Returns:
+        int: the number of tokens.
+
+    Raises:
+        ValueError: if the file has an invalid token.
+    """
+    lexemes, distinct = scan_lexemes(input_text)
+    lines = {}
+    for kind, group in enumerate(distinct):
+        if kind == STRING_CONST:
+            texts = [xml_escape(lexeme[1:-1]) for lexeme in group]
+        elif kind == SYMBOL:
+            texts = map(xml_escape, group)
+        elif kind == INT_CONST:
+            # the constants are written as their value, without leading
+            # zeros, which is what most of them are already
+            texts = group
+            listed = "\n".join(group)
+            if not listed.isascii() or LEADING_ZERO.search(listed):
+                texts = map(int, group)
+        else:
+            texts = group  # keywords and identifiers have nothing to escape
+        lines.update(zip(group, map(TOKEN_TEMPLATES[kind].__mod__, texts)))
+    line_of = lines.__getitem__
+    output_file.write("<tokens>\n")
+    for start in range(0, len(lexemes), TOKENS_PER_WRITE):
+        output_file.write("".join(map(
+            line_of, lexemes[start:start + TOKENS_PER_WRITE])))
+    output_file.write("</tokens>\n")
+    return len(lexemes)
+
+
+def open_tokenizer(input_file: typing.TextIO,
+                   streaming: bool = False) -> JackTokenizer:
+    """
+    Returns:
+        JackTokenizer: a tokenizer of the file, which is streaming if asked.
+    """
+    if streaming:
+        return StreamingJackTokenizer(input_file)
+    return JackTokenizer(input_file)
+
+
+def collect_paths(argument_path: str, mode: str = "syntax",
+                  output_format: str = "xml"
+                  ) -> typing.List[typing.Tuple[str, str]]:
+    """
+    Args:
+        argument_path (str): the absolute path of a .jack file, or of a
+            directory of them.
+        mode (str): see analyze_file.
+        output_format (str): see analyze_file.
+
+    Returns:
+        list: pairs of the path of every .jack file, and the path of its
+        output.
+    """
+    if os.path.isdir(argument_path):
+        files_to_assemble = [
+            os.path.join(argument_path, filename)
+            for filename in os.listdir(argument_path)]
     else:
-        raise ValueError(f"Unsupported token type: {token_type}")
+        files_to_assemble = [argument_path]
+    paths = []
+    for input_path in files_to_assemble:
+        filename, extension = os.path.splitext(input_path)
+        if extension.lower() != ".jack":
+            continue
+        if mode == "vm":
+            output_path = filename + ".vm"
+        elif mode == "tokens":
+            output_path = filename + "T.xml"
+        elif OUTPUT_SUFFIXES[output_format] is None:
+            output_path = os.devnull
+        else:
+            output_path = filename + OUTPUT_SUFFIXES[output_format]
+        paths.append((input_path, output_path))
+    return paths
+
+
+def default_cache_dir(argument_path: str) -> str:
+    """
+    Returns:
+        str: the directory of the build manifest of the given file or
+        directory: by default, the manifest is kept next to the outputs.
+    """
+    if os.path.isdir(argument_path):
+        return argument_path
+    return os.path.dirname(argument_path)
 
 
 def analyze_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        streaming: bool = False, output_format: str = "xml",
+        mode: str = "syntax", optimize: int = 0,
+        stats: Stats = NULL_STATS) -> typing.Dict[str, int]:
     """Analyzes a single file.
 
     Args:
         input_file (typing.TextIO): the file to analyze.
         output_file (typing.TextIO): writes all output to this file.
+        streaming (bool): tokenize the input lazily while it is parsed,
+            instead of reading it whole up front.
+        mode (str): "syntax" to write the parse tree, "vm" to compile the
+            file into VM code, in a single pass, or "tokens" to only write
+            its token stream as XML (see write_tokens), whatever the
+            output format. The tokens mode does not support streaming.
+        optimize (int): the optimization level of the VM code, see
+            VMCompilationEngine.
+        output_format (str): one of the formats in OUTPUT_SUFFIXES. The file
+            is parsed into a tree, which is then written out in this format;
+            when streaming, it is emitted while it is parsed instead, so that
+            memory use stays flat.
+        stats (Stats): collects the statistics of the file. The phases are
+            "tokenize", "parse" (or "compile" in vm mode) and "emit", and
+            the reads and writes they do are also timed as "read" and
+            "write". When streaming, the tokenizing and the emitting happen
+            during the parsing. In tokens mode, the tokens are written out
+            while tokenizing.
+
+    Returns:
+        dict: the number of rewrites of every kind made by the optimizer,
+        and the number of VM instructions before and after the peephole
+        optimizer.
+    """
+    input_file = stats.reader(input_file)
+    output_file = stats.writer(output_file)
+    if mode == "tokens":
+        if streaming:
+            raise ValueError("The tokens mode does not support streaming")
+        input_text = input_file.read()
+        with stats.phase("tokenize"):
+            stats.count("tokens", write_tokens(input_text, output_file))
+        stats.count("lines", input_text.count("\n") + 1)
+        return {}
+    with stats.phase("tokenize"):
+        tokenizer = open_tokenizer(input_file, streaming)
+    counts = {}
+    if mode == "vm":
+        engine = VMCompilationEngine(tokenizer, output_file, optimize)
+        stats.instrument(engine)
+        with stats.phase("compile"):
+            engine.compile_class()
+        if not streaming:
+            stats.count("tokens", len(tokenizer.ids))
+        counts = engine.counts
+    elif streaming and output_format in EMITTERS:
+        emitter = stats.emitter(EMITTERS[output_format](output_file))
+        engine = CompilationEngine(tokenizer, output_file, emitter)
+        stats.instrument(engine)
+        with stats.phase("parse"):
+            engine.compile_class()
+    else:
+        engine = CompilationEngine(tokenizer, output_file)
+        stats.instrument(engine)
+        with stats.phase("parse"):
+            tree = engine.parse_class()
+        with stats.phase("emit"):
+            if output_format == "ast":
+                JackAST.dump(tree, output_file)
+            else:
+                JackAST.emit(tree, stats.emitter(
+                    EMITTERS[output_format](output_file)))
+        if output_format == "ast":
+            stats.count_tree(tree)
+    stats.count("lines", tokenizer.line)
+    return counts
+
+
+def compile_source(source: str, **options) -> typing.Union[str, bytes]:
+    """Analyzes the source of a single class in memory, without files.
+
+    Args:
+        source (str): the source of a Jack class.
+        options: keyword arguments of analyze_file, e.g. mode="vm".
+
+    Returns:
+        str: the output, or bytes in the binary formats.
+
+    Raises:
+        ValueError: if the source does not compile, e.g. a JackSyntaxError.
+    """
+    binary = (options.get("mode", "syntax") == "syntax" and
+              options.get("output_format") in BINARY_FORMATS)
+    output = io.BytesIO() if binary else io.StringIO()
+    analyze_file(io.StringIO(source), output, **options)
+    return output.getvalue()
+
+
+def try_compile_source(source: str, **options
+                       ) -> typing.Tuple[typing.Union[str, bytes, None],
+                                         typing.Optional[str]]:
+    """
+    Returns:
+        tuple: the output of compile_source, or None if it failed, and the
+        error, or None if it succeeded.
+    """
+    try:
+        return compile_source(source, **options), None
+    except Exception as exception:  # reported by the caller
+        return None, describe_error(exception)
+
+
+def compile_many(sources: typing.Mapping[str, str], jobs: int = 1,
+                 **options) -> typing.Dict[str, typing.Union[str, bytes]]:
+    """Analyzes a batch of sources in memory, dispatching them to a pool of
+    jobs worker processes if jobs > 1.
+
+    Args:
+        sources (mapping): the source of every class, by any name, e.g. its
+            file name.
+        jobs (int): the number of worker processes.
+        options: keyword arguments of analyze_file.
+
+    Returns:
+        dict: the output of every source, by its name.
+
+    Raises:
+        ValueError: if any of the sources does not compile, once all of
+            them are compiled. The message has a line per error, which
+            starts with the name of its source.
+    """
+    compile_one = functools.partial(try_compile_source, **options)
+    if jobs > 1 and len(sources) > 1:
+        with concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+            # a chunk of sources per task, since they are usually small
+            results = list(pool.map(compile_one, sources.values(),
+                                    chunksize=-(-len(sources) // (4 * jobs))))
+    else:
+        results = list(map(compile_one, sources.values()))
+    outputs = dict(zip(sources, results))
+    errors = [f"{name}: {line}"
+              for name, (_, error) in outputs.items() if error is not None
+              for line in error.splitlines()]
+    if errors:
+        raise ValueError("\n".join(errors))
+    return {name: output for name, (output, _) in outputs.items()}
+
+
+def analyze_path(input_path: str, output_path: str, stats: bool = False,
+                 rule_timing: bool = False, **options
+                 ) -> typing.Tuple[float, typing.Optional[str],
+                                   typing.Dict[str, int],
+                                   typing.Optional[dict]]:
+    """Analyzes the file at the given path. Errors are returned rather than
+    raised, so that one bad file does not stop the others. The output is
+    written to a temporary file next to the output file, which replaces it
+    only if the analysis succeeds, so that a syntax error found after the
+    emitter has written part of the output does not leave that part behind.
+    Output to os.devnull is written there directly.
+
+    Args:
+        input_path (str): the path of the file to analyze.
+        output_path (str): the path of the file to write the output to.
+        stats (bool): whether to collect the statistics of the file.
+        rule_timing (bool): whether the statistics include the time spent in
+            every grammar rule.
+        options: keyword arguments of analyze_file.
+
+    Returns:
+        tuple: the CPU time spent on the file, in seconds, an error
+        message, or None if the file was analyzed successfully, the
+        rewrite counts returned by analyze_file, and the statistics of the
+        file, if asked for.
+    """
+    start = time.process_time()
+    file_stats = Stats(rule_timing) if stats else NULL_STATS
+    temporary_path = None
+    try:
+        binary = (options.get("mode", "syntax") == "syntax" and
+                  options.get("output_format") in BINARY_FORMATS)
+        with open(input_path, 'r') as input_file:
+            if output_path == os.devnull:
+                output_file = open(output_path, 'wb' if binary else 'w')
+            else:
+                descriptor, temporary_path = tempfile.mkstemp(
+                    ".tmp", dir=os.path.dirname(output_path) or os.curdir)
+                os.chmod(temporary_path, 0o666 & ~UMASK)
+                output_file = os.fdopen(descriptor, 'wb' if binary else 'w')
+            with output_file:
+                counts = analyze_file(input_file, output_file,
+                                      stats=file_stats, **options)
+        if temporary_path is not None:
+            os.replace(temporary_path, output_path)
+        error = None
+    except Exception as exception:  # reported per file by the caller
+        error = describe_error(exception)
+        counts = {}
+        if temporary_path is not None and os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    return (time.process_time() - start, error, counts,
+            file_stats.as_dict() if stats else None)
+
+
+def describe_error(exception: Exception) -> str:
+    """
+    Returns:
+        str: a line per error that the exception reports, e.g. per syntax
+        error of a JackSyntaxError, each with the type of the exception.
+    """
+    return "\n".join(f"{type(exception).__name__}: {line}"
+                     for line in str(exception).splitlines() or [""])
+
+
+def report_file(input_path: str, error: typing.Optional[str],
+                counts: typing.Dict[str, int]) -> None:
+    """Prints the error and the optimizer counts of a file, if any."""
+    if counts:
+        print(f"{input_path}: " + ", ".join(
+            f"{count} {kind}" for kind, count in counts.items()),
+            file=sys.stderr)
+    if error is not None:
+        for line in error.splitlines():  # a line per syntax error
+            print(f"{input_path}: {line}", file=sys.stderr)
+
+
+class Pipeline:
+    """Analyzes files in three stages that overlap, for many small files on
+    slow storage: a pool of reader threads reads the inputs ahead, a single
+    compiler analyzes them in memory, and a pool of writer threads writes
+    the outputs. The stages pass files through bounded queues, so a stage
+    that gets ahead blocks until the next one catches up, and at most
+    queue_size files wait between two stages.
+
+    The time every stage spends blocked on a queue is kept in stalls, in
+    seconds, summed over the threads of the stage:
+
+    - "readers": waiting for room in the input queue, i.e. for the compiler;
+    - "compiler_input": waiting for the readers;
+    - "compiler_output": waiting for room in the output queue, i.e. for the
+      writers;
+    - "writers": waiting for the compiler.
+    """
+
+    def __init__(self, readers: int = 4, writers: int = 4,
+                 queue_size: int = 16) -> None:
+        """
+        Args:
+            readers (int): the number of reader threads.
+            writers (int): the number of writer threads.
+            queue_size (int): the number of files each queue holds.
+        """
+        self.readers = readers
+        self.writers = writers
+        self.queue_size = queue_size
+        self.stalls = {}
+
+    def run(self, paths: typing.List[typing.Tuple[str, str]],
+            stats: bool = False, rule_timing: bool = False, **options
+            ) -> typing.Dict[str, tuple]:
+        """Analyzes the files through the pipeline.
+
+        Args:
+            paths (list): pairs of input and output paths.
+            stats (bool): see analyze_path.
+            rule_timing (bool): see analyze_path.
+            options: keyword arguments of analyze_file.
+
+        Returns:
+            dict: the result of every input path, as analyze_path returns
+            it. The CPU time is that of the compiler thread only.
+        """
+        binary = (options.get("mode", "syntax") == "syntax" and
+                  options.get("output_format") in BINARY_FORMATS)
+        pending = queue.SimpleQueue()  # the files left to read
+        for input_path, output_path in paths:
+            pending.put((input_path, output_path))
+        inputs = queue.Queue(self.queue_size)
+        outputs = queue.Queue(self.queue_size)
+        lock = threading.Lock()
+        stalls = {"readers": 0.0, "compiler_input": 0.0,
+                  "compiler_output": 0.0, "writers": 0.0}
+        results = {}
+
+        def read() -> None:
+            stalled = 0.0
+            try:
+                while True:
+                    try:
+                        input_path, output_path = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        with open(input_path, 'r') as input_file:
+                            content, error = input_file.read(), None
+                    except OSError as exception:
+                        content, error = None, describe_error(exception)
+                    start = time.perf_counter()
+                    inputs.put((input_path, output_path, content, error))
+                    stalled += time.perf_counter() - start
+            finally:
+                inputs.put(None)  # this reader is done
+                with lock:
+                    stalls["readers"] += stalled
+
+        def write() -> None:
+            stalled = 0.0
+            while True:
+                start = time.perf_counter()
+                item = outputs.get()
+                stalled += time.perf_counter() - start
+                if item is None:
+                    break
+                input_path, output_path, content = item
+                try:
+                    with open(output_path,
+                              'wb' if binary else 'w') as output_file:
+                        output_file.write(content)
+                except OSError as exception:
+                    with lock:
+                        results[input_path] = (
+                            results[input_path][0], describe_error(exception),
+                            {}, results[input_path][3])
+            with lock:
+                stalls["writers"] += stalled
+
+        threads = [threading.Thread(target=read)
+                   for _ in range(self.readers)]
+        threads += [threading.Thread(target=write)
+                    for _ in range(self.writers)]
+        for thread in threads:
+            thread.start()
+        done = 0  # the number of readers that are done
+        try:
+            while done < self.readers:
+                start = time.perf_counter()
+                item = inputs.get()
+                stalls["compiler_input"] += time.perf_counter() - start
+                if item is None:
+                    done += 1
+                    continue
+                input_path, output_path, content, error = item
+                cpu_start = time.thread_time()
+                file_stats = Stats(rule_timing) if stats else NULL_STATS
+                counts = {}
+                output = None
+                if error is None:
+                    output = io.BytesIO() if binary else io.StringIO()
+                    try:
+                        counts = analyze_file(
+                            io.StringIO(content), output, stats=file_stats,
+                            **options)
+                    except Exception as exception:  # reported per file
+                        error = describe_error(exception)
+                with lock:
+                    results[input_path] = (
+                        time.thread_time() - cpu_start, error, counts,
+                        file_stats.as_dict() if stats else None)
+                if error is None:
+                    start = time.perf_counter()
+                    outputs.put((input_path, output_path, output.getvalue()))
+                    stalls["compiler_output"] += time.perf_counter() - start
+        finally:
+            # on an error, unblock the readers, and stop them early
+            while done < self.readers:
+                try:
+                    pending.get_nowait()
+                except queue.Empty:
+                    done += inputs.get() is None
+            for _ in range(self.writers):
+                outputs.put(None)
+            for thread in threads:
+                thread.join()
+        self.stalls = stalls
+        return results
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: the stall times of the last run.
+        """
+        stalls = self.stalls
+        return (f"Pipeline stalls: readers {stalls['readers']:.3f}s waiting "
+                f"for the compiler, compiler {stalls['compiler_input']:.3f}s "
+                f"waiting for the readers and "
+                f"{stalls['compiler_output']:.3f}s for the writers, writers "
+                f"{stalls['writers']:.3f}s waiting for the compiler")
+
+
+def analyze_paths(paths: typing.List[typing.Tuple[str, str]], jobs: int,
+                  cache: typing.Optional[BuildCache] = None,
+                  stats_path: typing.Optional[str] = None,
+                  pipeline: typing.Optional[Pipeline] = None,
+                  **options) -> int:
+    """Analyzes all files, dispatching them to a pool of jobs worker
+    processes if jobs > 1, or to a pipeline if one is given. Errors and
+    optimizer rewrites are reported per file, and a summary of the wall time
+    against the summed CPU time is printed.
+
+    Args:
+        paths (list): pairs of input and output paths.
+        jobs (int): the number of worker processes.
+        cache (BuildCache): if given, files that are up to date in it are
+            skipped, and it is updated with the files that are analyzed.
+        stats_path (str): if given, the statistics of every file that is
+            analyzed, and their summary, are written to this path as JSON,
+            or to the standard output if it is "-".
+        pipeline (Pipeline): if given, the files are analyzed through it,
+            in this process, instead of by jobs processes. Its stall times
+            are printed, and included in the statistics.
+        options: keyword arguments of analyze_path.
+
+    Returns:
+        int: the number of files that failed.
     """
-    tokenizer = JackTokenizer(input_file)
-    engine = CompilationEngine(tokenizer, output_file)
-    engine.compile_class()
-    # output_file.write('<tokens>\n')
-    # while tokenizer.has_more_tokens():
-    #     tokenizer.advance()
-    #     token_type = tokenizer.token_type()
-    #     write_tokens(token_type, tokenizer, output_file)
-    # output_file.write('</tokens>\n')
+    wall_start = time.perf_counter()
+    if cache is not None:
+        cache.reset_statistics()
+        paths = [(input_path, output_path)
+                 for input_path, output_path in paths
+                 if not cache.is_up_to_date(input_path, output_path)]
+    if stats_path is not None:
+        options["stats"] = True
+    results = {}
+    if pipeline is not None:
+        jobs = 1
+        results = pipeline.run(paths, **options)
+    elif jobs > 1 and len(paths) > 1:
+        with concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+            futures = {
+                pool.submit(analyze_path, input_path, output_path,
+                            **options): input_path
+                for input_path, output_path in paths}
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = future.result()
+    else:
+        for input_path, output_path in paths:
+            results[input_path] = analyze_path(
+                input_path, output_path, **options)
+    wall_time = time.perf_counter() - wall_start
+
+    failures = 0
+    for input_path, output_path in paths:
+        _, error, counts, _ = results[input_path]
+        report_file(input_path, error, counts)
+        if error is not None:
+            failures += 1
+            if cache is not None:
+                cache.forget(input_path)
+        elif cache is not None:
+            cache.update(input_path, output_path)
+    if cache is not None:
+        cache.save()
+        print(cache.statistics(), file=sys.stderr)
+    cpu_time = sum(result[0] for result in results.values())
+    print(f"Analyzed {len(paths) - failures}/{len(paths)} files with "
+          f"{min(jobs, len(paths))} jobs: wall time {wall_time:.3f}s, "
+          f"CPU time {cpu_time:.3f}s", file=sys.stderr)
+    if pipeline is not None:
+        print(pipeline.report(), file=sys.stderr)
+    if stats_path is not None:
+        files = {input_path: results[input_path][3]
+                 for input_path, _ in paths}
+        report = {
+            "jobs": min(jobs, len(paths)), "wall_time": wall_time,
+            "cpu_time": cpu_time, "total": summarize(files.values()),
+            "files": files}
+        if pipeline is not None:
+            report["stalls"] = pipeline.stalls
+        report = json.dumps(report, indent=2)
+        if stats_path == "-":
+            print(report)
+        else:
+            with open(stats_path, 'w') as stats_file:
+                stats_file.write(report + "\n")
+    return failures
 
 
+def compile_path(input_path: str, streaming: bool = False,
+                 optimize: int = 0, **options
+                 ) -> typing.Tuple[float, typing.Optional[str],
+                                   typing.Dict[str, int], typing.List[tuple]]:
+    """Compiles the file at the given path into VM code in memory. Errors
+    are returned rather than raised, like in analyze_path.
+
+    Args:
+        input_path (str): the path of the file to compile.
+        streaming (bool): see analyze_file.
+        optimize (int): see analyze_file.
+        options: the other keyword arguments of analyze_file, which are
+            ignored.
+
+    Returns:
+        tuple: the CPU time spent on the file, in seconds, an error message
+        or None, the counts of the optimizer, and the VM code of the file.
+    """
+    start = time.process_time()
+    try:
+        with open(input_path, 'r') as input_file:
+            engine = VMCompilationEngine(
+                open_tokenizer(input_file, streaming), None, optimize)
+            engine.compile_class()
+        error, counts = None, engine.counts
+        instructions = engine.writer.instructions
+    except Exception as exception:  # reported per file by the caller
+        error = describe_error(exception)
+        counts, instructions = {}, []
+    return time.process_time() - start, error, counts, instructions
+
+
+def analyze_program(paths: typing.List[typing.Tuple[str, str]], jobs: int,
+                    inline: int = 0, **options) -> int:
+    """Compiles all files into VM code as a single program: every file is
+    compiled in memory, in a pool of jobs worker processes if jobs > 1.
+    Then small functions are inlined, if asked, and the functions that
+    cannot be called from Main.main are removed before the code is written.
+    The inlining decisions and the removed functions are reported.
+
+    Args:
+        paths (list): pairs of input and output paths.
+        jobs (int): the number of worker processes.
+        inline (int): the size, in VM instructions, of the largest function
+            to inline, or 0 to inline nothing.
+        options: keyword arguments of analyze_file.
+
+    Returns:
+        int: the number of files that failed. Nothing is written if any did.
+    """
+    wall_start = time.perf_counter()
+    results = {}
+    if jobs > 1 and len(paths) > 1:
+        with concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+            futures = {pool.submit(compile_path, input_path, **options):
+                       input_path for input_path, _ in paths}
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = future.result()
+    else:
+        for input_path, _ in paths:
+            results[input_path] = compile_path(input_path, **options)
+
+    failures = 0
+    for input_path, _ in paths:
+        _, error, counts, _ = results[input_path]
+        report_file(input_path, error, counts)
+        if error is not None:
+            failures += 1
+    if failures:
+        return failures
+
+    program = Program({output_path: results[input_path][3]
+                       for input_path, output_path in paths})
+    total_functions = len(program.functions)
+    total_size = sum(map(len, program.functions.values()))
+    try:
+        if inline:
+            for line in program.inline_functions(inline):
+                print(line, file=sys.stderr)
+        removed = program.eliminate_dead_functions()
+    except ValueError as error:
+        print(f"{error}", file=sys.stderr)
+        return len(paths)
+    if inline and options.get("optimize", 0) >= 2:
+        # clean up after the inlined code
+        peephole = PeepholeOptimizer()
+        for name, code in program.functions.items():
+            program.functions[name] = peephole.optimize(code)
+    for name, size in removed:
+        print(f"Removed {name} ({size} instructions)", file=sys.stderr)
+    saved = sum(size for _, size in removed)
+    print(f"Removed {len(removed)}/{total_functions} functions: "
+          f"{saved}/{total_size} VM instructions saved "
+          f"({saved / max(total_size, 1):.1%})", file=sys.stderr)
+
+    for _, output_path in paths:
+        with open(output_path, 'w') as output_file:
+            writer = VMWriter(output_file)
+            writer.instructions = program.instructions(output_path)
+            writer.close()
+    cpu_time = sum(result[0] for result in results.values())
+    print(f"Compiled {len(paths)} files as one program with "
+          f"{min(jobs, len(paths))} jobs: wall time "
+          f"{time.perf_counter() - wall_start:.3f}s, "
+          f"CPU time {cpu_time:.3f}s", file=sys.stderr)
+    return 0
+
+
+class Watcher:
+    """Polls the inputs for changes, and analyzes the changed ones again. A
+    change is noticed by the size or the modification time of a file, and
+    confirmed by the hash of its content, so a file that is only touched is
+    not analyzed again. New files are picked up, too.
+    """
+
+    def __init__(self, argument_path: str, cache: BuildCache, jobs: int,
+                 **options) -> None:
+        """
+        Args:
+            argument_path (str): the absolute path of a .jack file, or of a
+                directory of them.
+            cache (BuildCache): the build cache, which skips the files that
+                are up to date when watching starts.
+            jobs (int): the number of worker processes.
+            options: keyword arguments of analyze_paths.
+        """
+        self.argument_path = argument_path
+        self.cache = cache
+        self.jobs = jobs
+        self.options = options
+        self.stamps = {}  # the size and modification time of every input
+        self.hashes = {}  # the hash of the content of every input
+
+    def changed_paths(self) -> typing.List[typing.Tuple[str, str]]:
+        """
+        Returns:
+            list: the pairs of input and output paths of the inputs that
+            changed since the last call, or all of them on the first call.
+        """
+        paths = collect_paths(self.argument_path,
+                              self.options.get("mode", "syntax"),
+                              self.options.get("output_format", "xml"))
+        changed = []
+        for input_path, output_path in paths:
+            try:
+                status = os.stat(input_path)
+            except OSError:  # removed since it was listed
+                continue
+            stamp = (status.st_size, status.st_mtime_ns)
+            if self.stamps.get(input_path) == stamp:
+                continue
+            self.stamps[input_path] = stamp
+            content_hash = file_hash(input_path)
+            if self.hashes.get(input_path) != content_hash:
+                self.hashes[input_path] = content_hash
+                changed.append((input_path, output_path))
+        for input_path in set(self.stamps) - {path for path, _ in paths}:
+            del self.stamps[input_path], self.hashes[input_path]
+        return changed
+
+    def run(self, interval: float) -> None:
+        """Analyzes the changed inputs every interval seconds, until
+        interrupted.
+        """
+        print(f"Watching {self.argument_path} for changes, press Ctrl-C to "
+              f"stop", file=sys.stderr)
+        try:
+            while True:
+                changed = self.changed_paths()
+                if changed:
+                    analyze_paths(changed, self.jobs, self.cache,
+                                  **self.options)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
 
 
 if "__main__" == __name__:
@@ -56,20 +816,127 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: JackAnalyzer <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
-    if os.path.isdir(argument_path):
-        files_to_assemble = [
-            os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
-    else:
-        files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".jack":
-            continue
-        output_path = filename + "Q.xml"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            analyze_file(input_file, output_file)
+    parser = argparse.ArgumentParser(
+        prog="JackAnalyzer",
+        description="Analyzes Jack files and writes their parse trees.")
+    parser.add_argument("input_path", help="a .jack file or a directory")
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="tokenize each file lazily, with a bounded lookahead window")
+    parser.add_argument(
+        "--mode", choices=("syntax", "vm"), default="syntax",
+        help="syntax: write the parse tree of each file (the default); "
+             "vm: compile each file into a .vm file")
+    parser.add_argument(
+        "--tokens", action="store_true",
+        help="instead of --mode, only tokenize each file, and write its "
+             "token stream to a T.xml file, without parsing it")
+    parser.add_argument(
+        "-O", "--optimize", type=int, choices=(0, 1, 2), default=0,
+        help="the optimization level of --mode vm: 0 compiles the code as "
+             "written (the default), 1 folds constants and simplifies "
+             "expressions, replacing multiplications and divisions by "
+             "powers of two with shifts, and 2 also runs a peephole "
+             "optimizer over the VM code")
+    parser.add_argument(
+        "--whole-program", action="store_true",
+        help="with --mode vm, compile all the files as one program, and "
+             "leave out the subroutines that Main.main never calls; the "
+             "build cache is not used")
+    parser.add_argument(
+        "--inline", type=int, default=0, metavar="MAX_SIZE",
+        help="with --whole-program, inline the non-recursive subroutines of "
+             "at most MAX_SIZE VM instructions into their callers "
+             "(default: 0, no inlining)")
+    parser.add_argument(
+        "--stats", metavar="PATH",
+        help="write a JSON report of the time spent in every phase, and of "
+             "the tokens, lines and nodes of every file, to PATH "
+             "(- for the standard output)")
+    parser.add_argument(
+        "--rule-timing", action="store_true",
+        help="with --stats, also report the cumulative time spent in every "
+             "compile_* grammar rule")
+    parser.add_argument(
+        "--format", choices=OUTPUT_SUFFIXES, default="xml",
+        help="the output format: XML parse trees (the default), compact JSON "
+             "parse trees, binary parse trees (see JackAST), or none, to only "
+             "check that the files parse")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1,
+        help="the number of files to analyze in parallel "
+             "(default: the number of CPUs)")
+    parser.add_argument(
+        "--pipeline", action="store_true",
+        help="instead of --jobs processes, analyze the files in this "
+             "process, with reader and writer threads that read the inputs "
+             "ahead and write the outputs behind, for many small files on "
+             "slow storage; the time every stage stalls is reported")
+    parser.add_argument(
+        "--io-threads", type=int, default=4,
+        help="with --pipeline, the number of reader threads and of writer "
+             "threads (default: 4)")
+    parser.add_argument(
+        "--queue-size", type=int, default=16,
+        help="with --pipeline, the number of files that may wait between "
+             "two stages (default: 16)")
+    parser.add_argument(
+        "--force", action="store_true",
+        help="analyze every file, even if it is up to date")
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="keep running, and analyze the files again whenever their "
+             "content changes, until interrupted")
+    parser.add_argument(
+        "--interval", type=float, default=0.2,
+        help="with --watch, the seconds between polls for changes "
+             "(default: 0.2)")
+    parser.add_argument(
+        "--cache-dir",
+        help="the directory of the build manifest "
+             "(default: the directory of the outputs)")
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.whole_program and args.mode != "vm":
+        parser.error("--whole-program requires --mode vm")
+    if args.inline and not args.whole_program:
+        parser.error("--inline requires --whole-program")
+    if args.rule_timing and not args.stats:
+        parser.error("--rule-timing requires --stats")
+    if args.stats and args.whole_program:
+        parser.error("--stats is not supported with --whole-program")
+    if args.tokens and (args.mode == "vm" or args.stream or
+                        args.format != "xml" or args.whole_program):
+        parser.error("--tokens is not supported with --mode vm, --stream, "
+                     "--format or --whole-program")
+    if args.io_threads < 1 or args.queue_size < 1:
+        parser.error("--io-threads and --queue-size must be at least 1")
+    if args.pipeline and args.whole_program:
+        parser.error("--pipeline is not supported with --whole-program")
+    if args.watch and (args.whole_program or args.stats):
+        parser.error("--watch is not supported with --whole-program or "
+                     "--stats")
+    mode = "tokens" if args.tokens else args.mode
+    argument_path = os.path.abspath(args.input_path)
+    paths_to_analyze = collect_paths(argument_path, mode, args.format)
+    if args.whole_program:
+        sys.exit(1 if analyze_program(
+            paths_to_analyze, args.jobs, args.inline, streaming=args.stream,
+            optimize=args.optimize) else 0)
+    build_cache = BuildCache(
+        os.path.abspath(args.cache_dir) if args.cache_dir else
+        default_cache_dir(argument_path),
+        compiler_fingerprint(mode, args.format, str(args.optimize)),
+        args.force)
+    options = {"streaming": args.stream, "output_format": args.format,
+               "mode": mode, "optimize": args.optimize}
+    if args.pipeline:
+        options["pipeline"] = Pipeline(args.io_threads, args.io_threads,
+                                       args.queue_size)
+    if args.watch:
+        Watcher(argument_path, build_cache, args.jobs, **options).run(
+            args.interval)
+    elif analyze_paths(paths_to_analyze, args.jobs, build_cache, args.stats,
+                       rule_timing=args.rule_timing, **options):
+        sys.exit(1)
@@ -5,10 +5,71 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import array
+import io
+import itertools
+import operator
 import typing
 import re
 
 
+# Token kinds, recorded once per token while scanning.
+KEYWORD, SYMBOL, IDENTIFIER, INT_CONST, STRING_CONST = range(5)
+TOKEN_TYPES = ("KEYWORD", "SYMBOL", "IDENTIFIER", "INT_CONST", "STRING_CONST")
+
+# A single master pattern. Every match skips whitespace and comments, then
+# reads one token; the alternatives are tried in this order, and the named
+# group that matched tells the kind of the token. Comments are only skipped
+# between tokens, so string constants may contain "//" and "/*".
+TOKEN_PATTERN = re.compile(
+    r"(?:\s|//[^\n]*|/\*[\s\S]*?\*/)*"  # whitespace and comments
+    r"(?:(?P<KEYWORD>(?:class|constructor|function|method|field|static|var|"
+    r"int|char|boolean|void|true|false|null|this|let|do|if|else|while|"
+    r"return)(?!\w))"
+    r"|(?P<UNCLOSED>/\*)"  # a comment that is never closed
+    r"|(?P<SYMBOL>[{}()\[\].,;+\-*/&|<>=~^#])"
+    r"|(?P<INT_CONST>\d+(?!\w))"
+    r'|(?P<STRING_CONST>"[^"\n]*")'  # string literals
+    r"|(?P<IDENTIFIER>[a-zA-Z_]\w*)"  # identifiers
+    r"|(?P<ERROR>\S)"
+    r"|(?P<END>\Z))")  # only whitespace and comments are left
+
+# The tokens of TOKEN_PATTERN as single groups, for scanning all the lexemes
+# of an input at once with findall(), without keeping their positions, see
+# scan_lexemes. It is simpler, and faster, since the distinct lexemes are
+# classified afterwards: keywords are matched as identifiers, and the errors
+# are in the group too: "/*" for an unclosed comment, a digit followed by
+# letters, and any other single character. A group is empty only at the end
+# of the input. Nothing ever needs to backtrack into a repetition, so they are
+# all possessive, which saves the matcher from saving their states.
+_SKIPPED = r"\s*+(?:(?://[^\n]*+|/\*[\s\S]*?\*/)\s*+)*+"
+_LEXEME = (r"([a-zA-Z_]\w*+|/\*|[{}()\[\].,;+\-*/&|<>=~^#]|\d\w*+|"
+           r"\"[^\"\n]*+\"|\S|)")
+# Most of the time of findall() goes to starting every match and making its
+# result, rather than to matching, so every match takes this many lexemes.
+LEXEMES_PER_MATCH = 16
+LEXEME_PATTERN = re.compile((_SKIPPED + _LEXEME) * LEXEMES_PER_MATCH)
+# The same pattern, for the inputs that are all ASCII: it is faster when \s,
+# \w and \d only have to tell ASCII characters apart. The whitespace is
+# spelled out as the ASCII characters that \s matches in a str pattern, which
+# include the separators \x1c-\x1f.
+ASCII_LEXEME_PATTERN = re.compile(
+    (_SKIPPED.replace(r"\s*+", r"[\t-\r\x1c- ]*+") + _LEXEME) *
+    LEXEMES_PER_MATCH, re.ASCII)
+_SYMBOLS = frozenset("{}()[].,;+-*/&|<>=~^#")
+_IDENTIFIER_STARTS = frozenset(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_")
+
+# Maps the index of the matching group of TOKEN_PATTERN to a token kind.
+_GROUP_KINDS = (None, KEYWORD, None, SYMBOL, INT_CONST, STRING_CONST,
+                IDENTIFIER, None, None)
+_UNCLOSED = TOKEN_PATTERN.groupindex["UNCLOSED"]
+_ERROR = TOKEN_PATTERN.groupindex["ERROR"]
+_END = TOKEN_PATTERN.groupindex["END"]
+
+MAX_INT = 32767
+
+
 class JackTokenizer:
     """Removes all comments from the input stream and breaks it
     into Jack language tokens, as specified by the Jack grammar.
@@ -123,47 +184,93 @@ class JackTokenizer:
         Args:
             input_stream (typing.TextIO): input stream.
         """
-
-        # Define regex patterns for each token type
-        keyword_pattern = r'\b(class|constructor|function|method|field|static|var|int|char|boolean|void|true|false|null|this|let|do|if|else|while|return)\b'
-        symbol_pattern = r'[{}()\[\].,;+\-*/&|<>=~^#]'
-        integer_pattern = r'\b\d{1,5}\b'  # Matches integers from 0 to 32767
-        string_pattern = r'"([^"\n]*)"'  # Matches string literals
-        identifier_pattern = r'\b[a-zA-Z_]\w*\b'  # Matches valid identifiers
-
-        # Combine all patterns into one pattern for matching
-        self.elements_pattern = f"({keyword_pattern}|{symbol_pattern}|{integer_pattern}|{string_pattern}|{identifier_pattern})"
-
         input_text = input_stream.read()
-
-        # remove multi-line comments (/* ... */ and /** ... */)
-        input_text = re.sub(r"/\*.*?\*/", "", input_text, flags=re.DOTALL)
-
-        input_lines = input_text.splitlines()
-
-        lines = list()
-        # remove inline remarks and strip
-        for line in input_lines:
-            line = line.strip().split("//", 1)[0].strip()
-            if is_valid_line(line):
-                lines.append(line)
-
         input_stream.close()
 
-        # Tokenize lines into tokens
-        self.tokens = self.tokenize_lines(lines)
+        # The token table: every distinct lexeme is stored once in the
+        # string table, and tokens refer to it by id.
+        self.lexemes = []  # the per-file string table
+        self.ids = array.array('I')  # lexeme id of every token
+        self.kinds = array.array('B')  # kind of every token
+        self.starts = array.array('I')  # start offset of every token
+        self.lines = array.array('I')  # line of every token, from 1
+        self.columns = array.array('I')  # column of every token, from 1
+        self._lexeme_ids = {}  # maps each lexeme to its id
+        self.line = 1  # the line reached by the scan
+        self.line_start = 0  # the offset at which that line starts
+        self.scan(input_text, 0)
         self.token_index = -1  # no token is currently chosen
 
-    def tokenize_lines(self, lines: list) -> list:
-        """Tokenizes all lines and returns a list of tokens.
+    def scan(self, text: str, offset: int, final: bool = True) -> int:
+        """Appends the tokens of the text to the token table in a single pass,
+        skipping whitespace and comments, and classifying and interning every
+        token as it is scanned.
+
+        Args:
+            text (str): the text to scan.
+            offset (int): the offset of the text in the input.
+            final (bool): whether the text runs up to the end of the input.
+                If not, a token that may continue past the text is left
+                unscanned.
 
         Returns:
-            list: List of tokens extracted from the lines.
+            int: the length of the prefix of the text that was scanned.
+        """
+        lexemes = self.lexemes
+        table = self._lexeme_ids
+        add_id = self.ids.append
+        add_kind = self.kinds.append
+        add_start = self.starts.append
+        add_line = self.lines.append
+        add_column = self.columns.append
+        check_lexeme = _check_lexeme
+        line, line_start = self.line, self.line_start
+        length = len(text)
+        scanned = 0
+        for match in TOKEN_PATTERN.finditer(text):
+            group = match.lastindex
+            if group == _END or not final and (
+                    match.end() == length or group == _UNCLOSED or
+                    (group == _ERROR and match.group(group) == '"' and
+                     text.find("\n", match.end()) < 0)):
+                break
+            start = match.start(group)
+            skipped = match.start()
+            if start != skipped:
+                # skipped whitespace and comments, keep track of lines
+                newlines = text.count("\n", skipped, start)
+                if newlines:
+                    line += newlines
+                    line_start = offset + text.rfind("\n", skipped, start) + 1
+            lexeme = match.group(group)
+            column = offset + start - line_start + 1
+            lexeme_id = table.get(lexeme)
+            if lexeme_id is None:
+                # a new lexeme, which is checked once for the whole input
+                check_lexeme(group, lexeme, line, column)
+                lexeme_id = table[lexeme] = len(lexemes)
+                lexemes.append(lexeme)
+            elif group == _ERROR:
+                # a known lexeme that is not a token here, e.g. the "1" of
+                # "1x" after the integer constant 1
+                check_lexeme(group, lexemes[lexeme_id], line, column)
+            add_id(lexeme_id)
+            add_kind(_GROUP_KINDS[group])
+            add_start(offset + start)
+            add_line(line)
+            add_column(column)
+            scanned = match.end()
+        self.line, self.line_start = line, line_start
+        return scanned
+
+    @property
+    def tokens(self) -> list:
         """
-        tokens = []
-        for line in lines:
-            tokens.extend(self.process_line(line))
-        return tokens
+        Returns:
+            list: the lexemes of all tokens, in order.
+        """
+        lexemes = self.lexemes
+        return [lexemes[lexeme_id] for lexeme_id in self.ids]
 
     def has_more_tokens(self) -> bool:
         """Do we have more tokens in the input?
@@ -171,7 +278,7 @@ class JackTokenizer:
         Returns:
             bool: True if there are more tokens, False otherwise.
         """
-        return self.token_index + 1 < len(self.tokens)
+        return self.token_index + 1 < len(self.ids)
 
     def advance(self) -> None:
         """Gets the next token from the input and makes it the current token. 
@@ -186,27 +293,31 @@ class JackTokenizer:
             str: the type of the current token, can be
             "KEYWORD", "SYMBOL", "IDENTIFIER", "INT_CONST", "STRING_CONST"
         """
-        token = self.tokens[self.token_index]
-
-        if token in JackTokenizer.KEYWORDS:
-            return "KEYWORD"
-
-        symbols = {'{', '}', '(', ')', '[', ']', '.', ',', ';', '+', '-', '*',
-                   '/', '&', '|', '<', '>', '=', '~', '^', '#'}
-        if token in symbols:
-            return "SYMBOL"
+        return TOKEN_TYPES[self.kinds[self.token_index]]
 
-        if token.isdigit():
-            return "INT_CONST"
-
-        if token.startswith('"') and token.endswith('"'):
-            return "STRING_CONST"
+    def lookahead(self) -> typing.Union[str, int]:
+        """
+        Returns:
+            the key of the current token in the parsing tables of Grammar:
+            the keyword or the symbol itself, or the kind of any other token.
+        """
+        index = self.token_index
+        kind = self.kinds[index]
+        return self.lexemes[self.ids[index]] if kind <= SYMBOL else kind
 
-        identifier_pattern = r'^[A-Za-z_]\w*$'
-        if re.match(identifier_pattern, token):
-            return "IDENTIFIER"
+    def lexeme(self) -> str:
+        """
+        Returns:
+            str: the current token, as it appears in the input.
+        """
+        return self.lexemes[self.ids[self.token_index]]
 
-        raise ValueError(f"Unknown token type for token: {token}")
+    def position(self) -> typing.Tuple[int, int]:
+        """
+        Returns:
+            tuple: the line and column of the current token, both from 1.
+        """
+        return self.lines[self.token_index], self.columns[self.token_index]
 
     def keyword(self) -> str:
         """
@@ -217,7 +328,7 @@ class JackTokenizer:
             "BOOLEAN", "CHAR", "VOID", "VAR", "STATIC", "FIELD", "LET", "DO", 
             "IF", "ELSE", "WHILE", "RETURN", "TRUE", "FALSE", "NULL", "THIS"
         """
-        return self.tokens[self.token_index]
+        return self.lexemes[self.ids[self.token_index]]
 
     def symbol(self) -> str:
         """
@@ -228,14 +339,7 @@ class JackTokenizer:
             symbol: '{' | '}' | '(' | ')' | '[' | ']' | '.' | ',' | ';' | '+' | 
               '-' | '*' | '/' | '&' | '|' | '<' | '>' | '=' | '~' | '^' | '#'
         """
-        current_symbol = self.tokens[self.token_index]
-        if current_symbol == '<':
-            return '&lt;'
-        elif current_symbol == '>':
-            return '&gt;'
-        elif current_symbol == '&':
-            return '&amp;'
-        return current_symbol
+        return self.lexemes[self.ids[self.token_index]]
 
     def identifier(self) -> str:
         """
@@ -247,7 +351,7 @@ class JackTokenizer:
                   starting with a digit. You can assume keywords cannot be
                   identifiers, so 'self' cannot be an identifier, etc'.
         """
-        return self.tokens[self.token_index]
+        return self.lexemes[self.ids[self.token_index]]
 
     def int_val(self) -> int:
         """
@@ -257,7 +361,7 @@ class JackTokenizer:
             Recall that integerConstant was defined in the grammar like so:
             integerConstant: A decimal number in the range 0-32767.
         """
-        return int(self.tokens[self.token_index])
+        return int(self.lexemes[self.ids[self.token_index]])
 
     def string_val(self) -> str:
         """
@@ -268,18 +372,137 @@ class JackTokenizer:
             StringConstant: '"' A sequence of Unicode characters not including 
                       double quote or newline '"'
         """
-        return self.tokens[self.token_index].strip('"')
+        return self.lexemes[self.ids[self.token_index]].strip('"')
+
+
+class StreamingJackTokenizer(JackTokenizer):
+    """A JackTokenizer that reads its input stream lazily, a chunk at a time,
+    instead of reading and tokenizing the whole input up front.
+
+    Only a small window of tokens is kept in the token table: the current
+    token and the tokens scanned ahead of it. Once the window is used up, it
+    is discarded (along with its string table) and the next chunk is
+    scanned, so memory use does not grow with the size of the input, and
+    parsing starts as soon as the first chunk is scanned.
+    """
+
+    CHUNK = 8192  # the number of characters to read at a time
+
+    def __init__(self, input_stream: typing.TextIO) -> None:
+        """Gets ready to tokenize the input stream, without reading it.
+
+        Args:
+            input_stream (typing.TextIO): input stream.
+        """
+        self.input_stream = input_stream
+        self.pending = ""  # input read but not scanned yet
+        self.offset = 0  # the offset of the pending input
+        self.lexemes = []
+        self.ids = array.array('I')
+        self.kinds = array.array('B')
+        self.starts = array.array('I')
+        self.lines = array.array('I')
+        self.columns = array.array('I')
+        self._lexeme_ids = {}
+        self.line = 1
+        self.line_start = 0
+        self.token_index = -1  # no token is currently chosen
+
+    def has_more_tokens(self) -> bool:
+        """Do we have more tokens in the input? Scans ahead if the window
+        holds no more tokens.
 
-    def process_line(self, line):
-        tokens = []
-        for match in re.finditer(self.elements_pattern, line):
-            token = match.group(0)
-            tokens.append(token)
-        return tokens
+        Returns:
+            bool: True if there are more tokens, False otherwise.
+        """
+        return self.token_index + 1 < len(self.ids) or self.fill()
 
+    def advance(self) -> None:
+        """Gets the next token from the input and makes it the current token.
+        This method should be called if has_more_tokens() is true.
+        Initially there is no current token.
+        """
+        self.token_index += 1
+        if self.token_index == len(self.ids):
+            # every token of the window was consumed, start a new one
+            self.lexemes.clear()
+            self._lexeme_ids.clear()
+            del self.ids[:], self.kinds[:], self.starts[:]
+            del self.lines[:], self.columns[:]
+            self.token_index = 0
+            self.fill()
+
+    def fill(self) -> bool:
+        """Reads and scans chunks of the input until tokens are added to the
+        window, or the input ends.
 
-def is_valid_line(line):
+        Returns:
+            bool: True if tokens were added, False otherwise.
+        """
+        count = len(self.ids)
+        while len(self.ids) == count and not self.input_stream.closed:
+            chunk = self.input_stream.read(StreamingJackTokenizer.CHUNK)
+            final = not chunk
+            if final:
+                self.input_stream.close()
+            text = self.pending + chunk
+            scanned = self.scan(text, self.offset, final)
+            self.pending = text[scanned:]
+            self.offset += scanned
+        return len(self.ids) > count
+
+
+def _check_lexeme(group: int, lexeme: str, line: int, column: int) -> None:
+    """Raises a ValueError if the lexeme matched by the given group of
+    TOKEN_PATTERN is not a valid token.
     """
-    Check if line contains content
+    if group == _UNCLOSED:
+        problem = "Unclosed comment"
+    elif group == _ERROR and lexeme == '"':
+        problem = "Unterminated string constant"
+    elif group == _ERROR:
+        problem = f"Unexpected character: {lexeme}"
+    elif _GROUP_KINDS[group] == INT_CONST and int(lexeme) > MAX_INT:
+        problem = f"Integer constant out of range: {lexeme}"
+    else:
+        return
+    raise ValueError(f"{problem} (line {line}, column {column})")
+
+
+def scan_lexemes(text: str) -> typing.Tuple[list, typing.Tuple[list, ...]]:
+    """Scans the tokens of a whole input in bulk, without keeping their
+    positions, for when only the token stream is needed. The distinct
+    lexemes are classified together, by their first character, with set
+    operations and C-level maps rather than one by one.
+
+    Args:
+        text (str): the input, to scan with LEXEME_PATTERN.
+
+    Returns:
+        tuple: the lexemes of all the tokens, in order, and the distinct
+        lexemes of every kind, as a tuple of lists indexed by the kind.
+
+    Raises:
+        ValueError: if the input has an invalid token, as JackTokenizer
+            reports it; the input is then tokenized again to find where.
     """
-    return line != ""
+    pattern = ASCII_LEXEME_PATTERN if text.isascii() else LEXEME_PATTERN
+    lexemes = list(itertools.chain.from_iterable(pattern.findall(text)))
+    while lexemes and not lexemes[-1]:
+        lexemes.pop()  # the end of the input
+    distinct = set(lexemes)
+    keywords = distinct.intersection(JackTokenizer.KEYWORDS)
+    symbols = distinct.intersection(_SYMBOLS)
+    others = list(distinct.difference(keywords, symbols))
+    firsts = list(map(operator.itemgetter(0), others))
+    identifiers = list(itertools.compress(
+        others, map(_IDENTIFIER_STARTS.__contains__, firsts)))
+    integers = list(itertools.compress(others, map(str.isdecimal, others)))
+    # a lone '"' is an unterminated string constant
+    strings = list(itertools.compress(others, map('"'.__eq__, firsts)))
+    if (len(identifiers) + len(integers) + len(strings) != len(others) or
+            '"' in distinct or max(map(int, integers), default=0) > MAX_INT):
+        JackTokenizer(io.StringIO(text))
+        raise ValueError("Invalid token")  # not reached
+    return lexemes, (list(keywords), list(symbols), identifiers, integers,
+                     strings)
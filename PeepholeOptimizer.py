@@ -0,0 +1,230 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+# VM instructions are tuples of a command and its arguments, as collected by
+# VMWriter, e.g. ("push", "constant", 7) or ("if-goto", "WHILE_END0").
+Instruction = tuple
+
+
+def _cancel(window: typing.List[Instruction]
+            ) -> typing.Optional[typing.List[Instruction]]:
+    # not; not and neg; neg
+    return []
+
+
+def _push_pop(window: typing.List[Instruction]
+              ) -> typing.Optional[typing.List[Instruction]]:
+    # push x; pop x
+    push, pop = window
+    if push[1:] == pop[1:]:
+        return []
+    return None
+
+
+def _add_zero(window: typing.List[Instruction]
+              ) -> typing.Optional[typing.List[Instruction]]:
+    # push constant 0; add (or sub, or or)
+    if window[0] == ("push", "constant", 0):
+        return []
+    return None
+
+
+def _constant_branch(window: typing.List[Instruction]
+                     ) -> typing.Optional[typing.List[Instruction]]:
+    # push constant c; if-goto l, and push constant c; not; if-goto l
+    if window[0][1] != "constant":
+        return None
+    value = window[0][2]
+    if len(window) == 3:
+        value = ~value
+    return [("goto", window[-1][1])] if value else []
+
+
+def _branch_over_goto(window: typing.List[Instruction]
+                      ) -> typing.Optional[typing.List[Instruction]]:
+    # lt; not; if-goto a; goto b; label a (or gt). The not is only
+    # the logical negation of a comparison, which is 0 or -1: of any other
+    # value, both it and the value may be nonzero. An eq never gets here,
+    # since _not_equal rewrites its not and if-goto first.
+    compare, _, branch, goto, label = window
+    if branch[1] == label[1]:
+        return [compare, ("if-goto", goto[1]), label]
+    return None
+
+
+def _not_equal(window: typing.List[Instruction]
+               ) -> typing.Optional[typing.List[Instruction]]:
+    # eq; not; if-goto l: x - y is zero exactly when x = y
+    return [("sub",), window[2]]
+
+
+def _goto_next(window: typing.List[Instruction]
+               ) -> typing.Optional[typing.List[Instruction]]:
+    # goto l; label l
+    goto, label = window
+    if goto[1] == label[1]:
+        return [label]
+    return None
+
+
+def _array_store(window: typing.List[Instruction]
+                 ) -> typing.Optional[typing.List[Instruction]]:
+    # The code of let a[i] = x, where x is a single push, saves x in temp 0
+    # while it sets that to a[i]. Unless x depends on that, it can be pushed
+    # after that is set instead.
+    value, save, set_that, restore, store = window
+    if (save == ("pop", "temp", 0) and set_that == ("pop", "pointer", 1)
+            and restore == ("push", "temp", 0) and
+            store == ("pop", "that", 0) and
+            value[1] not in {"that", "pointer"}):
+        return [set_that, value, store]
+    return None
+
+
+# The rewrites of the sliding window, by the commands of the instructions
+# they match at the end of the window. Every rewrite gets the matched
+# instructions, and returns the instructions to replace them with (always
+# fewer), or None if its other conditions do not hold.
+RULES = {
+    ("not", "not"): _cancel,
+    ("neg", "neg"): _cancel,
+    ("push", "pop"): _push_pop,
+    ("push", "add"): _add_zero,
+    ("push", "sub"): _add_zero,
+    ("push", "or"): _add_zero,
+    ("push", "if-goto"): _constant_branch,
+    ("push", "not", "if-goto"): _constant_branch,
+    ("lt", "not", "if-goto", "goto", "label"): _branch_over_goto,
+    ("gt", "not", "if-goto", "goto", "label"): _branch_over_goto,
+    ("eq", "not", "if-goto"): _not_equal,
+    ("goto", "label"): _goto_next,
+    ("push", "pop", "pop", "push", "pop"): _array_store,
+}
+WINDOW_SIZES = sorted({len(pattern) for pattern in RULES})
+JUMPS = {"goto", "if-goto"}
+
+
+class PeepholeOptimizer:
+    """Rewrites VM code to shorter, equivalent VM code. The code is scanned
+    with a sliding window, which is rewritten by the table of RULES, and
+    then jumps to jumps are threaded, and unreachable code and unused labels
+    are removed, until nothing changes.
+
+    The code must not keep values in temp 0 between statements, as VM code
+    written by VMCompilationEngine does not.
+    """
+
+    def __init__(self) -> None:
+        self.counts = {"peephole": 0}
+
+    def optimize(self, instructions: typing.List[Instruction]
+                 ) -> typing.List[Instruction]:
+        """
+        Args:
+            instructions (list): the VM code of a class.
+
+        Returns:
+            list: the optimized VM code.
+        """
+        changed = True
+        while changed:
+            rewrites = self.counts["peephole"]
+            instructions = self.slide(instructions)
+            instructions = self.thread_jumps(instructions)
+            instructions = self.remove_unreachable(instructions)
+            instructions = self.remove_unused_labels(instructions)
+            changed = self.counts["peephole"] != rewrites
+        return instructions
+
+    def slide(self, instructions: typing.List[Instruction]
+              ) -> typing.List[Instruction]:
+        """Moves a window over the code, and rewrites it with the RULES. The
+        result of a rewrite is scanned again, so rewrites can cascade.
+        """
+        output = []
+        pending = instructions[::-1]
+        while pending:
+            output.append(pending.pop())
+            for size in WINDOW_SIZES:
+                if size > len(output):
+                    break
+                window = output[-size:]
+                rule = RULES.get(tuple(instruction[0]
+                                       for instruction in window))
+                if rule is None:
+                    continue
+                replacement = rule(window)
+                if replacement is not None:
+                    self.counts["peephole"] += 1
+                    del output[-size:]
+                    pending.extend(reversed(replacement))
+                    break
+        return output
+
+    def thread_jumps(self, instructions: typing.List[Instruction]
+                     ) -> typing.List[Instruction]:
+        """Retargets jumps to labels that are immediately followed by another
+        label or by a goto, to the final destination.
+        """
+        targets = {}
+        for position, instruction in enumerate(instructions):
+            if instruction[0] != "label":
+                continue
+            following = instructions[position + 1:position + 2]
+            if following and following[0][0] in {"label", "goto"}:
+                targets[instruction[1]] = following[0][1]
+
+        def destination(label: str) -> str:
+            seen = {label}
+            while label in targets and targets[label] not in seen:
+                label = targets[label]
+                seen.add(label)
+            return label
+
+        output = []
+        for instruction in instructions:
+            if instruction[0] in JUMPS:
+                label = destination(instruction[1])
+                if label != instruction[1]:
+                    self.counts["peephole"] += 1
+                    instruction = (instruction[0], label)
+            output.append(instruction)
+        return output
+
+    def remove_unreachable(self, instructions: typing.List[Instruction]
+                           ) -> typing.List[Instruction]:
+        """Removes the code after a goto or a return, up to the next label or
+        function.
+        """
+        output = []
+        reachable = True
+        for instruction in instructions:
+            command = instruction[0]
+            if command == "label" or command == "function":
+                reachable = True
+            if reachable:
+                output.append(instruction)
+            else:
+                self.counts["peephole"] += 1
+            if command == "goto" or command == "return":
+                reachable = False
+        return output
+
+    def remove_unused_labels(self, instructions: typing.List[Instruction]
+                             ) -> typing.List[Instruction]:
+        """Removes the labels that no jump goes to."""
+        used = {instruction[1] for instruction in instructions
+                if instruction[0] in JUMPS}
+        output = []
+        for instruction in instructions:
+            if instruction[0] == "label" and instruction[1] not in used:
+                self.counts["peephole"] += 1
+            else:
+                output.append(instruction)
+        return output
@@ -0,0 +1,373 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import typing
+
+from BuildCache import file_hash
+from CompilationEngine import CompilationEngine
+from Emitter import Emitter
+from JackTokenizer import JackTokenizer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, hash TEXT NOT NULL, class TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS subroutines (
+    path TEXT NOT NULL, class TEXT NOT NULL, name TEXT NOT NULL,
+    kind TEXT NOT NULL, return_type TEXT NOT NULL,
+    parameters TEXT NOT NULL, line INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS variables (
+    path TEXT NOT NULL, class TEXT NOT NULL, name TEXT NOT NULL,
+    kind TEXT NOT NULL, type TEXT NOT NULL, line INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS calls (
+    path TEXT NOT NULL, caller TEXT NOT NULL, callee TEXT NOT NULL,
+    line INTEGER NOT NULL, column INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS subroutines_by_class ON subroutines (class, name);
+CREATE INDEX IF NOT EXISTS variables_by_class ON variables (class);
+CREATE INDEX IF NOT EXISTS calls_by_callee ON calls (callee);
+CREATE INDEX IF NOT EXISTS calls_by_caller ON calls (caller);
+"""
+
+# The tables with a row per symbol of a file, to drop when it is reindexed.
+SYMBOL_TABLES = ("subroutines", "variables", "calls")
+
+# A terminal, as collected by SymbolExtractor: its text, and its token index.
+Terminal = typing.Tuple[str, int]
+
+
+class SymbolExtractor(Emitter):
+    """Extracts the symbols of a class from the structure a
+    CompilationEngine parses: its name, its field and static variables, the
+    signature of its subroutines, and its call sites.
+
+    Every terminal emitted is a token, in order, so the position of a
+    terminal is found in the token arrays of the tokenizer by counting them.
+
+    A call site is resolved to the class whose subroutine it calls: the class
+    of the object, if it is called through a variable, the class itself if
+    the subroutine is called by its bare name, and otherwise the named class.
+    """
+
+    def __init__(self, tokenizer: JackTokenizer) -> None:
+        """
+        Args:
+            tokenizer (JackTokenizer): the tokenizer the engine reads. It
+                must keep all its tokens, so it cannot be a streaming one.
+        """
+        self.tokenizer = tokenizer
+        self.count = 0  # the number of terminals emitted so far
+        self.nodes = []  # (tag, direct terminals) of every open non-terminal
+        self.class_name = ""
+        self.subroutine = ""  # the subroutine the parse is in
+        self.types = {}  # the type of every variable in scope, by its name
+        self.class_types = {}  # the type of every field and static variable
+        self.subroutines = []  # (name, kind, return type, parameters, line)
+        self.variables = []  # (name, kind, type, line)
+        self.calls = []  # (caller, callee, line, column)
+
+    def open_tag(self, tag: str) -> None:
+        if tag == "subroutineDec":
+            self.types = dict(self.class_types)
+        self.nodes.append((tag, []))
+
+    def close_tag(self, tag: str) -> None:
+        _, terminals = self.nodes.pop()
+        if tag == "classVarDec":
+            kind, type_ = terminals[0][0], terminals[1][0]
+            for name, index in terminals[2:-1:2]:
+                self.class_types[name] = type_
+                self.variables.append(
+                    (name, kind, type_, self.tokenizer.lines[index]))
+        elif tag == "varDec":
+            for name, _ in terminals[2:-1:2]:
+                self.types[name] = terminals[1][0]
+        elif tag == "parameterList":
+            for (type_, _), (name, _) in zip(terminals[0::3],
+                                             terminals[1::3]):
+                self.types[name] = type_
+            (kind, _), (return_type, _), (name, index) = \
+                self.nodes[-1][1][:3]
+            self.subroutine = f"{self.class_name}.{name}"
+            self.subroutines.append((
+                name, kind, return_type,
+                ", ".join(f"{type_} {name}" for (type_, _), (name, _) in
+                          zip(terminals[0::3], terminals[1::3])),
+                self.tokenizer.lines[index]))
+
+    def terminal(self, tag: str, text: str) -> None:
+        index = self.count
+        self.count += 1
+        parent, terminals = self.nodes[-1]
+        if parent == "class" and tag == "identifier" and \
+                not self.class_name:
+            self.class_name = text
+        elif text == "(" and tag == "symbol" and \
+                parent in ("term", "doStatement"):
+            self.call(terminals)
+        terminals.append((text, index))
+
+    def call(self, terminals: typing.List[Terminal]) -> None:
+        """Records the call site that ends in the terminals, if any.
+
+        Args:
+            terminals (list): the direct terminals of a term or a do
+                statement, up to an opening parenthesis.
+        """
+        if len(terminals) >= 3 and terminals[-2][0] == ".":
+            (receiver, index), (name, _) = terminals[-3], terminals[-1]
+            callee = f"{self.types.get(receiver, receiver)}.{name}"
+        elif terminals:
+            name, index = terminals[-1]
+            callee = f"{self.class_name}.{name}"
+        else:
+            return  # a parenthesized expression
+        self.calls.append((self.subroutine, callee,
+                           self.tokenizer.lines[index],
+                           self.tokenizer.columns[index]))
+
+
+def extract_symbols(path: str) -> SymbolExtractor:
+    """Parses a .jack file and extracts its symbols.
+
+    Args:
+        path (str): the path of the file.
+
+    Returns:
+        SymbolExtractor: the symbols.
+
+    Raises:
+        ValueError: if the file does not parse, e.g. a JackSyntaxError, or
+            is not text.
+    """
+    with open(path, 'r') as input_file:
+        tokenizer = JackTokenizer(input_file)
+    extractor = SymbolExtractor(tokenizer)
+    CompilationEngine(tokenizer, None, extractor).compile_class()
+    return extractor
+
+
+class SymbolIndex:
+    """A persistent index of the symbols of a Jack project, in an SQLite
+    database: the classes, the signature of every subroutine, the field and
+    static variables, and every call site, resolved to the subroutine it
+    calls. Queries are answered from the database, without parsing.
+
+    The index is updated incrementally: a file is parsed again only if its
+    content has changed since it was indexed.
+    """
+
+    def __init__(self, database_path: str) -> None:
+        """
+        Args:
+            database_path (str): the path of the database, which is created
+                if it does not exist.
+        """
+        self.connection = sqlite3.connect(database_path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "SymbolIndex":
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+    def update(self, paths: typing.Iterable[str]
+               ) -> typing.Tuple[int, typing.Dict[str, str]]:
+        """Indexes the files that changed since they were last indexed. A
+        file that fails to parse keeps its previous symbols, and is parsed
+        again on the next update.
+
+        Args:
+            paths (typing.Iterable[str]): the paths of .jack files.
+
+        Returns:
+            tuple: the number of files indexed, and the error of every file
+            that could not be, by its path.
+        """
+        indexed, errors = 0, {}
+        with self.connection:
+            for path in paths:
+                path = os.path.abspath(path)
+                digest = file_hash(path)
+                row = self.connection.execute(
+                    "SELECT hash FROM files WHERE path = ?", (path,)
+                ).fetchone()
+                if row is not None and row[0] == digest:
+                    continue
+                try:
+                    symbols = extract_symbols(path)
+                except (OSError, ValueError, IndexError) as error:
+                    # ValueError is also a JackSyntaxError or a
+                    # UnicodeDecodeError
+                    errors[path] = str(error)
+                    continue
+                self.store(path, digest, symbols)
+                indexed += 1
+        return indexed, errors
+
+    def store(self, path: str, digest: str,
+              symbols: SymbolExtractor) -> None:
+        """Replaces the symbols of a file in the index."""
+        self.remove(path)
+        execute = self.connection.executemany
+        self.connection.execute("INSERT INTO files VALUES (?, ?, ?)",
+                                (path, digest, symbols.class_name))
+        execute("INSERT INTO subroutines VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(path, symbols.class_name) + row
+                 for row in symbols.subroutines])
+        execute("INSERT INTO variables VALUES (?, ?, ?, ?, ?, ?)",
+                [(path, symbols.class_name) + row
+                 for row in symbols.variables])
+        execute("INSERT INTO calls VALUES (?, ?, ?, ?, ?)",
+                [(path,) + row for row in symbols.calls])
+
+    def remove(self, path: str) -> None:
+        """Removes the symbols of a file from the index."""
+        for table in SYMBOL_TABLES + ("files",):
+            self.connection.execute(f"DELETE FROM {table} WHERE path = ?",
+                                    (path,))
+
+    def update_directory(self, directory: str
+                         ) -> typing.Tuple[int, typing.Dict[str, str]]:
+        """Updates the index of the .jack files of a directory, and drops
+        the files of the directory that no longer exist.
+
+        Returns:
+            tuple: see update.
+        """
+        directory = os.path.abspath(directory)
+        paths = [os.path.join(directory, filename)
+                 for filename in sorted(os.listdir(directory))
+                 if os.path.splitext(filename)[1].lower() == ".jack"]
+        with self.connection:
+            for path in self.paths():
+                if os.path.dirname(path) == directory and \
+                        not os.path.exists(path):
+                    self.remove(path)
+        return self.update(paths)
+
+    def paths(self) -> typing.List[str]:
+        """
+        Returns:
+            list: the paths of the indexed files.
+        """
+        return [path for path, in self.connection.execute(
+            "SELECT path FROM files ORDER BY path")]
+
+    def classes(self) -> typing.List[typing.Tuple[str, str]]:
+        """
+        Returns:
+            list: the name of every indexed class, and the path of its file.
+        """
+        return self.connection.execute(
+            "SELECT class, path FROM files ORDER BY class").fetchall()
+
+    def subroutines(self, class_name: str) -> typing.List[tuple]:
+        """
+        Returns:
+            list: the name, kind, return type, parameters and line of every
+            subroutine of the class.
+        """
+        return self.connection.execute(
+            "SELECT name, kind, return_type, parameters, line "
+            "FROM subroutines WHERE class = ? ORDER BY line",
+            (class_name,)).fetchall()
+
+    def variables(self, class_name: str) -> typing.List[tuple]:
+        """
+        Returns:
+            list: the name, kind ("static" or "field"), type and line of
+            every class variable of the class.
+        """
+        return self.connection.execute(
+            "SELECT name, kind, type, line FROM variables WHERE class = ? "
+            "ORDER BY line", (class_name,)).fetchall()
+
+    def callers(self, callee: str) -> typing.List[tuple]:
+        """
+        Args:
+            callee (str): a subroutine, e.g. "Foo.bar".
+
+        Returns:
+            list: the calling subroutine, path, line and column of every
+            call site of the subroutine.
+        """
+        return self.connection.execute(
+            "SELECT caller, path, line, column FROM calls WHERE callee = ? "
+            "ORDER BY path, line, column", (callee,)).fetchall()
+
+    def callees(self, caller: str) -> typing.List[tuple]:
+        """
+        Args:
+            caller (str): a subroutine, e.g. "Foo.bar".
+
+        Returns:
+            list: the called subroutine, path, line and column of every call
+            site in the subroutine.
+        """
+        return self.connection.execute(
+            "SELECT callee, path, line, column FROM calls WHERE caller = ? "
+            "ORDER BY path, line, column", (caller,)).fetchall()
+
+
+if "__main__" == __name__:
+    parser = argparse.ArgumentParser(
+        prog="SymbolIndex",
+        description="Maintains an index of the symbols of a Jack project, "
+                    "and queries it.")
+    parser.add_argument("database_path", help="the path of the index")
+    parser.add_argument(
+        "--update", metavar="PATH", action="append", default=[],
+        help="index the changed files of a .jack file or a directory of "
+             "them (can be repeated)")
+    parser.add_argument("--classes", action="store_true",
+                        help="list the indexed classes")
+    parser.add_argument("--subroutines", metavar="CLASS",
+                        help="list the subroutines of a class")
+    parser.add_argument("--variables", metavar="CLASS",
+                        help="list the class variables of a class")
+    parser.add_argument("--callers", metavar="CLASS.NAME",
+                        help="list the call sites of a subroutine")
+    parser.add_argument("--callees", metavar="CLASS.NAME",
+                        help="list the call sites in a subroutine")
+    args = parser.parse_args()
+
+    failed = False
+    with SymbolIndex(args.database_path) as index:
+        for update_path in args.update:
+            if os.path.isdir(update_path):
+                count, failures = index.update_directory(update_path)
+            else:
+                count, failures = index.update([update_path])
+            print(f"Indexed {count} files of {update_path}", file=sys.stderr)
+            for failed_path, message in failures.items():
+                for line in message.splitlines():
+                    print(f"{failed_path}: {line}", file=sys.stderr)
+            failed = failed or bool(failures)
+        if args.classes:
+            for class_name, class_path in index.classes():
+                print(f"{class_name}\t{class_path}")
+        if args.subroutines:
+            for name, kind, return_type, parameters, line in \
+                    index.subroutines(args.subroutines):
+                print(f"{line}\t{kind} {return_type} {name}({parameters})")
+        if args.variables:
+            for name, kind, type_, line in index.variables(args.variables):
+                print(f"{line}\t{kind} {type_} {name}")
+        for query, subroutine in (("callers", args.callers),
+                                  ("callees", args.callees)):
+            if subroutine:
+                for other, call_path, line, column in \
+                        getattr(index, query)(subroutine):
+                    print(f"{call_path}:{line}:{column}\t{other}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,599 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+import JackTokenizer
+from CompilationEngine import JackSyntaxError
+from ExpressionOptimizer import (
+    Binary, Code, Constant, Expression, ExpressionBuilder,
+    ExpressionOptimizer, FALSE, TRUE, Unary)
+from PeepholeOptimizer import PeepholeOptimizer
+from SymbolTable import SymbolTable
+from VMWriter import VMWriter
+
+
+class VMCompilationEngine:
+    """Gets input from a JackTokenizer and compiles it into VM code, which is
+    written through a VMWriter. The structure of the recursive descent is the
+    same as in CompilationEngine, but nothing but the VM code is produced.
+    """
+
+    UNARY_OP = {'-': "NEG", '~': "NOT", '^': "SHIFTLEFT", '#': "SHIFTRIGHT"}
+    OP = {'+': "ADD", '-': "SUB", '&': "AND", '|': "OR", '<': "LT", '>': "GT",
+          '=': "EQ"}
+    OS_OP = {'*': "Math.multiply", '/': "Math.divide"}
+    STATEMENT_PREFIX = {"while", "do", "return", "let", "if"}
+    TYPES = {"int", "char", "boolean", JackTokenizer.IDENTIFIER}
+    # the segment of the variables of every kind
+    SEGMENTS = {"STATIC": "STATIC", "FIELD": "THIS", "ARG": "ARG",
+                "VAR": "LOCAL"}
+
+    def __init__(self, input_stream: JackTokenizer,
+                 output_stream: typing.Optional[typing.TextIO],
+                 optimize: int = 0) -> None:
+        """
+        Creates a new compilation engine with the given input and output. The
+        next routine called must be compileClass()
+        :param input_stream: The input stream.
+        :param output_stream: The output stream, or None to keep the code in
+            self.writer.instructions.
+        :param optimize: The optimization level: 0 compiles expressions as
+            written, 1 rewrites them with an ExpressionOptimizer, and 2 also
+            rewrites the VM code of the class with a PeepholeOptimizer.
+        """
+        self.tokenizer = input_stream
+        self.tokenizer.advance()  # now tokenizer set to first token
+        self.writer = VMWriter(output_stream)
+        self.symbols = SymbolTable()
+        self.class_name = None
+        self.label_count = 0
+        if optimize >= 1:
+            self.expressions = ExpressionOptimizer()
+        else:
+            self.expressions = ExpressionBuilder()
+        self.peephole = PeepholeOptimizer() if optimize >= 2 else None
+        self.counts = {}  # the number of rewrites of every kind, and so on
+
+    def location(self) -> str:
+        """
+        Returns:
+            str: the source location of the current token, for errors.
+        """
+        line, column = self.tokenizer.position()
+        return f"(line {line}, column {column})"
+
+    def error(self, expected: str) -> typing.NoReturn:
+        """Raises a JackSyntaxError about the current token.
+
+        Args:
+            expected (str): what was expected instead of the current token.
+        """
+        line, column = self.tokenizer.position()
+        raise JackSyntaxError([(
+            line, column, f"Expected {expected}, got "
+                          f"{self.tokenizer.token_type()} "
+                          f"'{self.tokenizer.lexeme()}'")])
+
+    def expect(self, key: str) -> None:
+        """Advances past the current token, which must be the given keyword
+        or symbol.
+        """
+        if self.tokenizer.lookahead() != key:
+            self.error(f"'{key}'")
+        self.tokenizer.advance()
+
+    def expect_identifier(self) -> str:
+        """Advances past the current token, which must be an identifier.
+
+        Returns:
+            str: the identifier.
+        """
+        if self.tokenizer.lookahead() != JackTokenizer.IDENTIFIER:
+            self.error("an identifier")
+        identifier = self.tokenizer.identifier()
+        self.tokenizer.advance()
+        return identifier
+
+    def new_labels(self, *names: str) -> typing.List[str]:
+        """
+        Returns:
+            list: a label for each of the given names, unique in the class.
+        """
+        count = self.label_count
+        self.label_count += 1
+        return [f"{name}{count}" for name in names]
+
+    def is_symbol(self, symbol: str) -> bool:
+        """
+        Returns:
+            bool: whether the current token is the given symbol.
+        """
+        return (self.tokenizer.token_type() == "SYMBOL" and
+                self.tokenizer.symbol() == symbol)
+
+    def is_keyword(self, keywords: typing.Container[str]) -> bool:
+        """
+        Returns:
+            bool: whether the current token is one of the given keywords.
+        """
+        return (self.tokenizer.token_type() == "KEYWORD" and
+                self.tokenizer.keyword() in keywords)
+
+    def push_variable(self, name: str) -> None:
+        """Pushes the value of the named variable."""
+        _, kind, index = self.variable(name)
+        self.writer.write_push(VMCompilationEngine.SEGMENTS[kind], index)
+
+    def pop_variable(self, name: str) -> None:
+        """Pops the top of the stack into the named variable."""
+        _, kind, index = self.variable(name)
+        self.writer.write_pop(VMCompilationEngine.SEGMENTS[kind], index)
+
+    def variable(self, name: str) -> tuple:
+        """
+        Returns:
+            tuple: the type, kind and index of the variable.
+        """
+        entry = self.symbols.lookup(name)
+        if entry is None:
+            raise ValueError(
+                f"Undefined variable: {name} {self.location()}")
+        return entry
+
+    def compile_class(self) -> None:
+        """Compiles a complete class.
+
+        Raises:
+            JackSyntaxError: at the first syntax error. Unlike
+                CompilationEngine, this engine does not recover from syntax
+                errors, and writes no code for a class that has any.
+        """
+        try:
+            self.compile_class_members()
+        except IndexError:  # the tokens ran out
+            raise JackSyntaxError([(self.tokenizer.line, None,
+                                    "Unexpected end of input")]) from None
+        self.counts.update(self.expressions.counts)
+        if self.peephole is not None:
+            instructions = self.writer.instructions
+            before = len(instructions)
+            instructions[:] = self.peephole.optimize(instructions)
+            self.counts.update(self.peephole.counts)
+            self.counts["instructions before"] = before
+            self.counts["instructions after"] = len(instructions)
+        self.writer.close()
+
+    def compile_class_members(self) -> None:
+        """Compiles the tokens of a complete class, which must be all the
+        tokens of the input.
+        """
+        self.expect("class")
+        self.class_name = self.expect_identifier()
+        self.expect("{")
+
+        while self.is_keyword({"static", "field"}):
+            self.compile_class_var_dec()
+
+        while self.is_keyword({"constructor", "function", "method"}):
+            self.compile_subroutine()
+
+        if self.tokenizer.lookahead() != "}":
+            self.error("'}'")
+        if self.tokenizer.has_more_tokens():
+            self.tokenizer.advance()
+            self.error("the end of input")
+
+    def compile_class_var_dec(self) -> None:
+        """Compiles a static declaration or a field declaration."""
+        kind = self.tokenizer.keyword().upper()  # 'field/static'
+        self.tokenizer.advance()
+        self.compile_var_names(kind)
+
+    def compile_var_names(self, kind: str) -> None:
+        """Compiles a type followed by a comma-separated list of variable names
+        and a ';', and defines the variables with the given kind.
+        """
+        type_ = self.compile_type()
+        self.symbols.define(self.expect_identifier(), type_, kind)
+
+        # handle additional variable names separated by commas
+        while self.is_symbol(','):
+            self.tokenizer.advance()
+            self.symbols.define(self.expect_identifier(), type_, kind)
+
+        self.expect(";")
+
+    def compile_subroutine(self) -> None:
+        """
+        Compiles a complete method, function, or constructor.
+        You can assume that classes with constructors have at least one field,
+        you will understand why this is necessary in project 11.
+        """
+        subroutine_kind = self.tokenizer.keyword()
+        self.symbols.start_subroutine()
+        if subroutine_kind == "method":
+            self.symbols.define("this", self.class_name, "ARG")
+        self.tokenizer.advance()
+        if self.is_keyword({"void"}):
+            self.tokenizer.advance()
+        else:
+            self.compile_type()
+        name = f"{self.class_name}.{self.expect_identifier()}"
+        self.expect("(")
+        self.compile_parameter_list()
+        self.expect(")")
+        self.expect("{")
+
+        while self.is_keyword({"var"}):
+            self.compile_var_dec()
+
+        self.writer.write_function(name, self.symbols.var_count("VAR"))
+        if subroutine_kind == "constructor":
+            self.writer.write_push("CONST", self.symbols.var_count("FIELD"))
+            self.writer.write_call("Memory.alloc", 1)
+            self.writer.write_pop("POINTER", 0)
+        elif subroutine_kind == "method":
+            self.writer.write_push("ARG", 0)
+            self.writer.write_pop("POINTER", 0)
+
+        self.compile_statements()
+        self.expect("}")
+
+    def compile_parameter_list(self) -> None:
+        """Compiles a (possibly empty) parameter list, not including the
+        enclosing "()".
+        """
+        if not self.is_symbol(")"):
+            type_ = self.compile_type()
+            self.symbols.define(self.expect_identifier(), type_, "ARG")
+
+            while self.is_symbol(','):
+                self.tokenizer.advance()
+                type_ = self.compile_type()
+                self.symbols.define(self.expect_identifier(), type_, "ARG")
+
+    def compile_var_dec(self) -> None:
+        """Compiles a var declaration."""
+        self.tokenizer.advance()  # 'var'
+        self.compile_var_names("VAR")
+
+    def compile_statements(self) -> None:
+        """Compiles a sequence of statements, not including the enclosing
+        "{}".
+        """
+        while self.is_keyword(VMCompilationEngine.STATEMENT_PREFIX):
+            keyword = self.tokenizer.keyword()
+            if keyword == "do":
+                self.compile_do()
+            elif keyword == "let":
+                self.compile_let()
+            elif keyword == "while":
+                self.compile_while()
+            elif keyword == "return":
+                self.compile_return()
+            else:
+                self.compile_if()
+
+    def compile_do(self) -> None:
+        """Compiles a do statement."""
+        self.tokenizer.advance()  # do
+        self.compile_subroutine_call(self.expect_identifier())
+        self.writer.write_pop("TEMP", 0)  # ignore the returned value
+        self.expect(";")
+
+    def compile_let(self) -> None:
+        """Compiles a let statement."""
+        self.tokenizer.advance()  # let
+        name = self.expect_identifier()
+        if self.is_symbol("["):
+            self.push_variable(name)
+            self.tokenizer.advance()  # [
+            self.compile_expression()
+            self.expect("]")
+            self.writer.write_arithmetic("ADD")
+            self.expect("=")
+            self.compile_expression()
+            self.writer.write_pop("TEMP", 0)
+            self.writer.write_pop("POINTER", 1)
+            self.writer.write_push("TEMP", 0)
+            self.writer.write_pop("THAT", 0)
+        else:
+            self.expect("=")
+            self.compile_expression()
+            self.pop_variable(name)
+        self.expect(";")
+
+    def compile_while(self) -> None:
+        """Compiles a while statement."""
+        loop, end = self.new_labels("WHILE_EXP", "WHILE_END")
+        self.tokenizer.advance()  # while
+        self.expect("(")
+        self.writer.write_label(loop)
+        self.compile_expression()
+        self.writer.write_arithmetic("NOT")
+        self.writer.write_if(end)
+        self.expect(")")
+        self.expect("{")
+        self.compile_statements()
+        self.writer.write_goto(loop)
+        self.writer.write_label(end)
+        self.expect("}")
+
+    def compile_return(self) -> None:
+        """Compiles a return statement."""
+        self.tokenizer.advance()  # return
+        if self.is_symbol(";"):
+            self.writer.write_push("CONST", 0)
+        else:
+            self.compile_expression()
+        self.writer.write_return()
+        self.expect(";")
+
+    def compile_if(self) -> None:
+        """Compiles a if statement, possibly with a trailing else clause."""
+        otherwise, end = self.new_labels("IF_ELSE", "IF_END")
+        self.tokenizer.advance()  # if
+        self.expect("(")
+        self.compile_expression()
+        self.writer.write_arithmetic("NOT")
+        self.writer.write_if(otherwise)
+        self.expect(")")
+        self.expect("{")
+        self.compile_statements()
+        self.expect("}")
+        if self.is_keyword({"else"}):
+            self.writer.write_goto(end)
+            self.writer.write_label(otherwise)
+            self.tokenizer.advance()  # else
+            self.expect("{")
+            self.compile_statements()
+            self.expect("}")
+            self.writer.write_label(end)
+        else:
+            self.writer.write_label(otherwise)
+
+    def compile_expression(self) -> None:
+        """Compiles an expression."""
+        self.write_expression(self.expression_tree())
+
+    # The constructs that contain a nested expression or term, which
+    # expression_tree resumes when it ends: an operand of an expression, the
+    # operand of a unary operator, a parenthesized expression, an array
+    # index and an argument of a call, and the end of the expression.
+    (AFTER_OPERAND, AFTER_UNARY, AFTER_PARENS, AFTER_INDEX, AFTER_ARGUMENT,
+     DONE) = range(6)
+
+    def expression_tree(self) -> Expression:
+        """Parses an expression without recursion, like
+        CompilationEngine.compile_nested: every construct that contains a
+        nested expression or term is pushed onto an explicit stack, with the
+        state to resume it in, so the nesting depth is unbounded. The code
+        of a term that is not rewritten, e.g. a variable or a call, is
+        written as it is parsed, along with the expressions nested in it,
+        and then taken back as a Code tree.
+
+        Returns:
+            Expression: the tree of the expression at the current token, built
+            through the expression builder, which may rewrite it.
+        """
+        tokenizer = self.tokenizer
+        lookahead = tokenizer.lookahead
+        instructions = self.writer.instructions
+        expressions = self.expressions
+        OP, OS_OP, UNARY_OP = (VMCompilationEngine.OP,
+                               VMCompilationEngine.OS_OP,
+                               VMCompilationEngine.UNARY_OP)
+        AFTER_OPERAND, AFTER_UNARY, AFTER_PARENS, AFTER_INDEX, \
+            AFTER_ARGUMENT = (VMCompilationEngine.AFTER_OPERAND,
+                              VMCompilationEngine.AFTER_UNARY,
+                              VMCompilationEngine.AFTER_PARENS,
+                              VMCompilationEngine.AFTER_INDEX,
+                              VMCompilationEngine.AFTER_ARGUMENT)
+        stack = [(VMCompilationEngine.DONE,), (AFTER_OPERAND, None, None)]
+        tree = None
+        parse_term = True
+        while True:
+            if parse_term:
+                key = lookahead()
+                start = len(instructions)
+                if key == JackTokenizer.INT_CONST:
+                    tree = Constant(tokenizer.int_val())
+                    tokenizer.advance()
+                elif key == "true":
+                    tree = Constant(TRUE)
+                    tokenizer.advance()
+                elif key == "false" or key == "null":
+                    tree = Constant(FALSE)
+                    tokenizer.advance()
+                elif key == "(":
+                    tokenizer.advance()
+                    stack.append((AFTER_PARENS,))
+                    stack.append((AFTER_OPERAND, None, None))
+                    continue
+                elif key in UNARY_OP:
+                    tokenizer.advance()
+                    stack.append((AFTER_UNARY, key))
+                    continue
+                elif key == JackTokenizer.STRING_CONST:
+                    self.compile_string(tokenizer.string_val())
+                    tokenizer.advance()
+                    tree = Code(instructions[start:])
+                elif key == "this":
+                    self.writer.write_push("POINTER", 0)
+                    tokenizer.advance()
+                    tree = Code(instructions[start:])
+                elif key == JackTokenizer.IDENTIFIER:
+                    name = tokenizer.identifier()
+                    tokenizer.advance()
+                    key = lookahead()
+                    if key == "[":
+                        self.push_variable(name)
+                        tokenizer.advance()
+                        stack.append((AFTER_INDEX, start))
+                        stack.append((AFTER_OPERAND, None, None))
+                        continue
+                    if key == "(" or key == ".":
+                        name, n_args = self.compile_call_target(name)
+                        if lookahead() != ")":
+                            stack.append((AFTER_ARGUMENT, start, name, n_args))
+                            stack.append((AFTER_OPERAND, None, None))
+                            continue
+                        tokenizer.advance()
+                        self.writer.write_call(name, n_args)
+                    else:
+                        self.push_variable(name)
+                    tree = Code(instructions[start:])
+                else:
+                    self.error("a term")
+                del instructions[start:]
+                parse_term = False
+
+            # the nested expression or term, whose tree is tree, ended
+            frame = stack.pop()
+            state = frame[0]
+            if state == AFTER_OPERAND:
+                _, left, op = frame
+                if left is not None:
+                    tree = expressions.binary(op, left, tree)
+                key = lookahead()
+                if key in OP or key in OS_OP:
+                    tokenizer.advance()
+                    stack.append((AFTER_OPERAND, tree, key))
+                    parse_term = True
+            elif state == AFTER_UNARY:
+                tree = expressions.unary(frame[1], tree)
+            elif state == AFTER_PARENS:
+                self.expect(")")
+            elif state == AFTER_INDEX:
+                self.write_expression(tree)
+                self.expect("]")
+                self.writer.write_arithmetic("ADD")
+                self.writer.write_pop("POINTER", 1)
+                self.writer.write_push("THAT", 0)
+                tree = Code(instructions[frame[1]:])
+                del instructions[frame[1]:]
+            elif state == AFTER_ARGUMENT:
+                _, start, name, n_args = frame
+                self.write_expression(tree)
+                if lookahead() == ",":
+                    tokenizer.advance()
+                    stack.append((AFTER_ARGUMENT, start, name, n_args + 1))
+                    stack.append((AFTER_OPERAND, None, None))
+                    parse_term = True
+                else:
+                    self.expect(")")
+                    self.writer.write_call(name, n_args + 1)
+                    tree = Code(instructions[start:])
+                    del instructions[start:]
+            else:  # DONE
+                return tree
+
+    def write_expression(self, tree: Expression) -> None:
+        """Writes the code of an expression tree, in postorder."""
+        instructions = self.writer.instructions
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Binary):
+                stack.append(node.op)
+                stack.append(node.right)
+                stack.append(node.left)
+            elif isinstance(node, Unary):
+                stack.append(VMCompilationEngine.UNARY_OP[node.op])
+                stack.append(node.operand)
+            elif isinstance(node, Constant):
+                if node.value >= 0:
+                    self.writer.write_push("CONST", node.value)
+                else:
+                    self.writer.write_push("CONST", ~node.value)
+                    self.writer.write_arithmetic("NOT")
+            elif isinstance(node, Code):
+                instructions.extend(node.instructions)
+            elif node in VMCompilationEngine.OS_OP:
+                self.writer.write_call(VMCompilationEngine.OS_OP[node], 2)
+            elif node in VMCompilationEngine.OP:
+                self.writer.write_arithmetic(VMCompilationEngine.OP[node])
+            else:
+                self.writer.write_arithmetic(node)  # a unary command
+
+    def compile_string(self, string: str) -> None:
+        """Compiles a string constant into a new String object."""
+        self.writer.write_push("CONST", len(string))
+        self.writer.write_call("String.new", 1)
+        for char in string:
+            self.writer.write_push("CONST", ord(char))
+            self.writer.write_call("String.appendChar", 2)
+
+    def compile_expression_list(self) -> int:
+        """Compiles a (possibly empty) comma-separated list of expressions.
+
+        Returns:
+            int: the number of expressions in the list.
+        """
+        count = 0
+        if not self.is_symbol(")"):
+            self.compile_expression()
+            count += 1
+            while self.is_symbol(","):
+                self.tokenizer.advance()  # ,
+                self.compile_expression()
+                count += 1
+        return count
+
+    def compile_type(self) -> str:
+        """
+        Returns:
+            str: the type at the current token, a keyword or a class name.
+        """
+        if self.tokenizer.lookahead() not in VMCompilationEngine.TYPES:
+            self.error("a type")
+        if self.tokenizer.token_type() == "KEYWORD":
+            type_ = self.tokenizer.keyword()  # 'int/char/boolean'
+        else:
+            type_ = self.tokenizer.identifier()  # className
+        self.tokenizer.advance()
+        return type_
+
+    def compile_subroutine_call(self, identifier: str) -> None:
+        """Compiles a subroutine call, whose first identifier was already
+        consumed.
+        """
+        name, n_args = self.compile_call_target(identifier)
+        n_args += self.compile_expression_list()
+        self.expect(")")
+        self.writer.write_call(name, n_args)
+
+    def compile_call_target(self, identifier: str) -> typing.Tuple[str, int]:
+        """Compiles a subroutine call up to its '(', including, whose first
+        identifier was already consumed, and pushes the object of a method.
+
+        Returns:
+            tuple: the full name of the subroutine, and the number of
+            arguments pushed so far: 1 for a method, 0 for a function.
+        """
+        if self.is_symbol("("):
+            # a method of this class, called on this object
+            name = f"{self.class_name}.{identifier}"
+            self.writer.write_push("POINTER", 0)
+            n_args = 1
+        elif self.is_symbol("."):
+            self.tokenizer.advance()  # .
+            entry = self.symbols.lookup(identifier)
+            if entry is None:
+                # a function or a constructor of a class
+                name = f"{identifier}.{self.expect_identifier()}"
+                n_args = 0
+            else:
+                # a method, called on an object
+                name = f"{entry[0]}.{self.expect_identifier()}"
+                self.push_variable(identifier)
+                n_args = 1
+        else:
+            self.error("'(' or '.'")
+        self.expect("(")
+        return name, n_args
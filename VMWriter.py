@@ -0,0 +1,124 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+# The VM names of the segments of the writer's interface.
+SEGMENTS = {
+    "CONST": "constant", "ARG": "argument", "LOCAL": "local",
+    "STATIC": "static", "THIS": "this", "THAT": "that",
+    "POINTER": "pointer", "TEMP": "temp"}
+
+
+def format_instruction(instruction: tuple) -> str:
+    """
+    Args:
+        instruction (tuple): a VM command and its arguments, e.g.
+            ("push", "constant", 7).
+
+    Returns:
+        str: the instruction as a line of VM code.
+    """
+    return " ".join(map(str, instruction)) + "\n"
+
+
+class VMWriter:
+    """
+    Writes VM commands into a file. Encapsulates the VM command syntax.
+
+    The commands are collected as tuples of a command and its arguments, e.g.
+    ("push", "constant", 7) or ("add",), and written out on close(). Without
+    an output stream, they are kept in memory instead.
+    """
+
+    def __init__(self, output_stream: typing.Optional[typing.TextIO]) -> None:
+        """Creates a new file and prepares it for writing VM commands."""
+        self.output_stream = output_stream
+        self.instructions = []
+
+    def write_push(self, segment: str, index: int) -> None:
+        """Writes a VM push command.
+
+        Args:
+            segment (str): the segment to push from, can be "CONST", "ARG",
+            "LOCAL", "STATIC", "THIS", "THAT", "POINTER", "TEMP"
+            index (int): the index to push from.
+        """
+        self.instructions.append(("push", SEGMENTS[segment], index))
+
+    def write_pop(self, segment: str, index: int) -> None:
+        """Writes a VM pop command.
+
+        Args:
+            segment (str): the segment to pop to, can be "CONST", "ARG",
+            "LOCAL", "STATIC", "THIS", "THAT", "POINTER", "TEMP".
+            index (int): the index to pop to.
+        """
+        self.instructions.append(("pop", SEGMENTS[segment], index))
+
+    def write_arithmetic(self, command: str) -> None:
+        """Writes a VM arithmetic command.
+
+        Args:
+            command (str): the command to write, can be "ADD", "SUB", "NEG",
+            "EQ", "GT", "LT", "AND", "OR", "NOT", "SHIFTLEFT", "SHIFTRIGHT".
+        """
+        self.instructions.append((command.lower(),))
+
+    def write_label(self, label: str) -> None:
+        """Writes a VM label command.
+
+        Args:
+            label (str): the label to write.
+        """
+        self.instructions.append(("label", label))
+
+    def write_goto(self, label: str) -> None:
+        """Writes a VM goto command.
+
+        Args:
+            label (str): the label to go to.
+        """
+        self.instructions.append(("goto", label))
+
+    def write_if(self, label: str) -> None:
+        """Writes a VM if-goto command.
+
+        Args:
+            label (str): the label to go to.
+        """
+        self.instructions.append(("if-goto", label))
+
+    def write_call(self, name: str, n_args: int) -> None:
+        """Writes a VM call command.
+
+        Args:
+            name (str): the name of the function to call.
+            n_args (int): the number of arguments the function receives.
+        """
+        self.instructions.append(("call", name, n_args))
+
+    def write_function(self, name: str, n_locals: int) -> None:
+        """Writes a VM function command.
+
+        Args:
+            name (str): the name of the function.
+            n_locals (int): the number of local variables the function uses.
+        """
+        self.instructions.append(("function", name, n_locals))
+
+    def write_return(self) -> None:
+        """Writes a VM return command."""
+        self.instructions.append(("return",))
+
+    def close(self) -> None:
+        """Writes out all the commands, if there is an output stream."""
+        if self.output_stream is None:
+            return
+        self.output_stream.write(
+            "".join(map(format_instruction, self.instructions)))
+        self.instructions.clear()
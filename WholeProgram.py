@@ -0,0 +1,283 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+# The function the program starts from.
+ROOT = "Main.main"
+# The segments whose indices are remapped when a function is inlined.
+_FRAME_SEGMENTS = {"argument", "local"}
+
+
+def split_functions(instructions: typing.List[tuple]
+                    ) -> typing.Dict[str, typing.List[tuple]]:
+    """
+    Args:
+        instructions (list): the VM code of a class, as collected by
+            VMWriter.
+
+    Returns:
+        dict: the code of every function, from its function command up to
+        the next one, by name, in order.
+    """
+    functions = {}
+    code = None
+    for instruction in instructions:
+        if instruction[0] == "function":
+            code = functions[instruction[1]] = []
+        code.append(instruction)
+    return functions
+
+
+def class_of(function: str) -> str:
+    """
+    Returns:
+        str: the name of the class of the function.
+    """
+    return function.split(".", 1)[0]
+
+
+def uses_segment(instruction: tuple, segments: typing.Container[str]
+                 ) -> bool:
+    """
+    Returns:
+        bool: whether the instruction is a push or a pop of one of the
+        segments.
+    """
+    return instruction[0] in {"push", "pop"} and instruction[1] in segments
+
+
+def called_functions(code: typing.List[tuple]) -> typing.Set[str]:
+    """
+    Returns:
+        set: the names of the functions that the code calls.
+    """
+    return {instruction[1] for instruction in code
+            if instruction[0] == "call"}
+
+
+class Program:
+    """The VM code of all the classes of a program, split into functions, so
+    that it can be optimized as a whole. The classes are kept apart, by any
+    key, e.g. the path of the file they are written to.
+    """
+
+    def __init__(self, classes: typing.Dict[typing.Hashable,
+                                            typing.List[tuple]]) -> None:
+        """
+        Args:
+            classes (dict): the VM code of every class, by its key.
+        """
+        self.functions = {}  # the code of every function, by name
+        self.classes = {}  # the names of the functions of every class
+        self.inlined_calls = 0
+        for key, instructions in classes.items():
+            functions = split_functions(instructions)
+            self.functions.update(functions)
+            self.classes[key] = list(functions)
+
+    def instructions(self, key: typing.Hashable) -> typing.List[tuple]:
+        """
+        Returns:
+            list: the VM code of the class, with the functions that are still
+            in the program.
+        """
+        return [instruction for name in self.classes[key]
+                if name in self.functions
+                for instruction in self.functions[name]]
+
+    def reachable_functions(self, root: str = ROOT) -> typing.Set[str]:
+        """
+        Returns:
+            set: the names of the functions of the program that can be
+            called, directly or indirectly, from the root. Calls to functions
+            outside the program, e.g. of the OS, are ignored.
+        """
+        if root not in self.functions:
+            raise ValueError(f"The program has no {root} function")
+        reachable = {root}
+        stack = [root]
+        while stack:
+            for callee in called_functions(self.functions[stack.pop()]):
+                if callee in self.functions and callee not in reachable:
+                    reachable.add(callee)
+                    stack.append(callee)
+        return reachable
+
+    def eliminate_dead_functions(self, root: str = ROOT
+                                 ) -> typing.List[typing.Tuple[str, int]]:
+        """Removes the functions, methods and constructors that can never be
+        called, see reachable_functions().
+
+        Returns:
+            list: the name and the number of VM instructions of every
+            function that was removed, in order.
+        """
+        reachable = self.reachable_functions(root)
+        removed = [(name, len(code)) for name, code in self.functions.items()
+                   if name not in reachable]
+        for name, _ in removed:
+            del self.functions[name]
+        return removed
+
+    def is_recursive(self, name: str) -> bool:
+        """
+        Returns:
+            bool: whether the function can call itself, directly or
+            indirectly.
+        """
+        seen = set()
+        stack = [name]
+        while stack:
+            for callee in called_functions(self.functions[stack.pop()]):
+                if callee == name:
+                    return True
+                if callee in self.functions and callee not in seen:
+                    seen.add(callee)
+                    stack.append(callee)
+        return False
+
+    def inline_functions(self, max_size: int, root: str = ROOT
+                         ) -> typing.List[str]:
+        """Replaces the calls to small functions, methods and constructors
+        with their code, see inline_call(). A function is inlined if it has
+        at most max_size instructions, is not recursive, and does not use
+        the statics of another class than the caller's. The functions are
+        processed callees first, so code that was inlined is inlined
+        further.
+
+        Returns:
+            list: a line that describes the decision at every call site of a
+            function of the program.
+        """
+        log = []
+        for name in self.postorder(root):
+            code = self.functions[name]
+            _, _, n_locals = code[0]
+            uses_this = any(uses_segment(instruction, {"this", "pointer"})
+                            for instruction in code)
+            extra_locals = 0  # the most locals added by a call site
+            output = [code[0]]
+            for instruction in code[1:]:
+                if (instruction[0] != "call" or
+                        instruction[1] not in self.functions):
+                    output.append(instruction)
+                    continue
+                _, callee, n_args = instruction
+                reason = self.inline_obstacle(name, callee, max_size)
+                if reason is None:
+                    inlined, added = self.inline_call(
+                        callee, n_args, n_locals, uses_this)
+                    output += inlined
+                    extra_locals = max(extra_locals, added)
+                    log.append(f"{name}: inlined {callee} "
+                               f"({len(inlined)} instructions)")
+                else:
+                    output.append(instruction)
+                    log.append(f"{name}: kept the call to {callee} "
+                               f"({reason})")
+            output[0] = ("function", name, n_locals + extra_locals)
+            self.functions[name] = output
+        return log
+
+    def inline_obstacle(self, caller: str, callee: str,
+                        max_size: int) -> typing.Optional[str]:
+        """
+        Returns:
+            str: why the callee cannot be inlined into the caller, or None
+            if it can.
+        """
+        code = self.functions[callee]
+        if len(code) - 1 > max_size:
+            return f"{len(code) - 1} > {max_size} instructions"
+        if self.is_recursive(callee):
+            return "recursive"
+        if (class_of(callee) != class_of(caller) and
+                any(uses_segment(instruction, {"static"})
+                    for instruction in code)):
+            return f"uses the statics of {class_of(callee)}"
+        return None
+
+    def postorder(self, root: str = ROOT) -> typing.List[str]:
+        """
+        Returns:
+            list: the functions that are reachable from the root, every one
+            after the functions it calls (except in cycles).
+        """
+        if root not in self.functions:
+            raise ValueError(f"The program has no {root} function")
+        order = []
+        seen = {root}
+        stack = [(root, iter(sorted(called_functions(self.functions[root]))))]
+        while stack:
+            name, callees = stack[-1]
+            for callee in callees:
+                if callee in self.functions and callee not in seen:
+                    seen.add(callee)
+                    stack.append((callee, iter(sorted(
+                        called_functions(self.functions[callee])))))
+                    break
+            else:
+                stack.pop()
+                order.append(name)
+        return order
+
+    def inline_call(self, callee: str, n_args: int, first_local: int,
+                    uses_this: bool) -> typing.Tuple[typing.List[tuple], int]:
+        """Translates a call to the callee into a copy of its code, with its
+        arguments and locals moved into new locals of the caller, starting
+        at first_local. The arguments are popped into their locals, and the
+        locals are set to 0, like in a call; labels are renamed, and every
+        return jumps to the end of the copy, with the returned value on the
+        stack. The new locals are only used while the copy runs, so every
+        call site can use the same ones.
+
+        Args:
+            callee (str): the name of the function to inline.
+            n_args (int): the number of arguments of the call.
+            first_local (int): the number of locals of the caller.
+            uses_this (bool): whether the caller uses this, which must be
+                restored if the callee sets it.
+
+        Returns:
+            tuple: the code, and the number of locals it adds to the caller.
+        """
+        self.inlined_calls += 1
+        suffix = f".{callee}.{self.inlined_calls}"
+        end = "INLINE_END" + suffix
+        code = self.functions[callee]
+        _, _, n_locals = code[0]
+        saves_this = uses_this and ("pop", "pointer", 0) in code
+        saved = first_local + n_args + n_locals
+
+        output = []
+        if saves_this:
+            output += [("push", "pointer", 0), ("pop", "local", saved)]
+        for index in reversed(range(n_args)):
+            output.append(("pop", "local", first_local + index))
+        for index in range(n_locals):
+            output += [("push", "constant", 0),
+                       ("pop", "local", first_local + n_args + index)]
+        for position, instruction in enumerate(code[1:], 1):
+            command = instruction[0]
+            if uses_segment(instruction, _FRAME_SEGMENTS):
+                index = instruction[2]
+                if instruction[1] == "local":
+                    index += n_args
+                output.append((command, "local", first_local + index))
+            elif command in {"label", "goto", "if-goto"}:
+                output.append((command, instruction[1] + suffix))
+            elif command == "return":
+                if position < len(code) - 1:
+                    output.append(("goto", end))
+            else:
+                output.append(instruction)
+        if ("goto", end) in output:
+            output.append(("label", end))
+        if saves_this:
+            output += [("push", "local", saved), ("pop", "pointer", 0)]
+        return output, n_args + n_locals + saves_this
@@ -0,0 +1,10 @@
+"""
+Benchmarks for the Jack analyzer. Every benchmark is a module of this package
+that can be run from the repository root, e.g.:
+
+    python -m benchmarks.token_store
+
+benchmarks.suite measures the throughput of every phase of the analyzer on
+a corpus generated by benchmarks.corpus, and saves the results as JSON for
+comparison between versions.
+"""
@@ -0,0 +1,200 @@
+"""
+A seeded generator of synthetic Jack classes, for benchmarks.
+
+The classes look like real programs: fields and statics, constructors,
+methods and functions with parameters and locals, nested if and while
+statements, long expressions with array accesses and subroutine calls,
+string constants and comments. The same seed always generates the same
+corpus.
+
+Usage, to write a corpus to a directory:
+
+    python -m benchmarks.corpus DIRECTORY [--files N] [--seed S]
+"""
+import argparse
+import os
+import random
+import typing
+
+TYPES = ("int", "char", "boolean", "Array", "String")
+OPS = ("+", "-", "*", "/", "&", "|", "<", ">", "=")
+WORDS = ("alpha", "beta", "gamma", "delta", "count", "size", "index", "value",
+         "total", "step", "limit", "width", "height", "speed", "score")
+
+
+class ClassGenerator:
+    """Generates the source of a single random class."""
+
+    def __init__(self, rng: random.Random, name: str,
+                 classes: typing.List[str], subroutines: int = 12,
+                 depth: int = 3) -> None:
+        """
+        Args:
+            rng (random.Random): the source of randomness.
+            name (str): the name of the class.
+            classes (list): the names of all the classes of the corpus, whose
+                functions the class calls.
+            subroutines (int): the number of subroutines of the class.
+            depth (int): the deepest nesting of statements.
+        """
+        self.rng = rng
+        self.name = name
+        self.classes = classes
+        self.subroutines = subroutines
+        self.depth = depth
+        self.lines = []
+        self.variables = []  # the variables that are in scope
+
+    def word(self) -> str:
+        return f"{self.rng.choice(WORDS)}{self.rng.randrange(100)}"
+
+    def write(self, indent: int, line: str) -> None:
+        self.lines.append("    " * indent + line)
+
+    def generate(self) -> str:
+        """
+        Returns:
+            str: the source of the class.
+        """
+        rng = self.rng
+        self.write(0, f"/** The generated class {self.name}. */")
+        self.write(0, f"class {self.name} {{")
+        fields = list(dict.fromkeys(
+            self.word() for _ in range(rng.randint(1, 5))))
+        statics = list(dict.fromkeys(
+            self.word() for _ in range(rng.randint(0, 3))))
+        if fields:
+            self.write(1, f"field int {', '.join(fields)};")
+        if statics:
+            self.write(1, f"static Array {', '.join(statics)};")
+        self.write(0, "")
+        for number in range(self.subroutines):
+            self.generate_subroutine(number, fields, statics)
+        self.write(0, "}")
+        return "\n".join(self.lines) + "\n"
+
+    def generate_subroutine(self, number: int, fields: typing.List[str],
+                            statics: typing.List[str]) -> None:
+        rng = self.rng
+        kind = ("constructor" if number == 0 else
+                rng.choice(("method", "method", "function")))
+        return_type = self.name if kind == "constructor" else "int"
+        parameters = list(dict.fromkeys(
+            self.word() for _ in range(rng.randint(0, 3))))
+        local_names = list(dict.fromkeys(
+            self.word() for _ in range(rng.randint(1, 4))))
+        local_names = [name for name in local_names if name not in parameters]
+        self.variables = parameters + local_names + statics
+        if kind != "function":
+            self.variables += fields
+        self.write(1, f"// subroutine {number} of {self.name}")
+        self.write(1, f"{kind} {return_type} f{number}(" + ", ".join(
+            f"int {parameter}" for parameter in parameters) + ") {")
+        self.write(2, f"var int {', '.join(local_names + ['i'])};")
+        self.write(2, "var Array buffer;")
+        self.variables += ["i"]
+        self.generate_statements(2, self.depth)
+        self.write(2, "return this;" if kind == "constructor" else
+                   f"return {self.expression(2)};")
+        self.write(1, "}")
+        self.write(0, "")
+
+    def generate_statements(self, indent: int, depth: int) -> None:
+        rng = self.rng
+        for _ in range(rng.randint(2, 6)):
+            choice = rng.random()
+            if depth > 0 and choice < 0.15:
+                self.write(indent, f"if ({self.expression(2)}) {{")
+                self.generate_statements(indent + 1, depth - 1)
+                if rng.random() < 0.5:
+                    self.write(indent, "} else {")
+                    self.generate_statements(indent + 1, depth - 1)
+                self.write(indent, "}")
+            elif depth > 0 and choice < 0.3:
+                self.write(indent, f"while ({self.expression(2)}) {{")
+                self.generate_statements(indent + 1, depth - 1)
+                self.write(indent, "}")
+            elif choice < 0.4:
+                self.write(indent, f"do {self.call(1)};")
+            elif choice < 0.5:
+                self.write(indent, f"let buffer[{self.expression(1)}] = "
+                                   f"{self.expression(3)};")
+            elif choice < 0.55:
+                self.write(indent, f'do Output.printString("{self.text()}");')
+            else:
+                variable = rng.choice(self.variables)
+                self.write(indent, f"let {variable} = {self.expression(3)};"
+                                   f"  // update {variable}")
+
+    def text(self) -> str:
+        return " ".join(self.rng.choice(WORDS)
+                        for _ in range(self.rng.randint(1, 6)))
+
+    def call(self, depth: int) -> str:
+        rng = self.rng
+        arguments = ", ".join(self.expression(depth - 1)
+                              for _ in range(rng.randint(0, 3)))
+        target = rng.choice(self.classes)
+        return f"{target}.f{rng.randrange(1, self.subroutines)}({arguments})"
+
+    def term(self, depth: int) -> str:
+        rng = self.rng
+        choice = rng.random()
+        if depth > 0 and choice < 0.15:
+            return f"({self.expression(depth - 1)})"
+        if depth > 0 and choice < 0.25:
+            return self.call(depth)
+        if depth > 0 and choice < 0.35:
+            return f"buffer[{self.expression(depth - 1)}]"
+        if choice < 0.45:
+            return f"{rng.choice('-~')}{self.term(depth - 1)}"
+        if choice < 0.7:
+            return str(rng.randrange(32768))
+        if choice < 0.75:
+            return rng.choice(("true", "false", "null"))
+        return rng.choice(self.variables)
+
+    def expression(self, depth: int) -> str:
+        rng = self.rng
+        terms = [self.term(depth) for _ in range(rng.randint(1, 4))]
+        expression = terms[0]
+        for term in terms[1:]:
+            expression += f" {rng.choice(OPS)} {term}"
+        return expression
+
+
+def generate_corpus(files: int, seed: int = 0, subroutines: int = 12,
+                    depth: int = 3) -> typing.Dict[str, str]:
+    """
+    Args:
+        files (int): the number of classes to generate.
+        seed (int): the seed of the generator.
+        subroutines (int): the number of subroutines per class.
+        depth (int): the deepest nesting of statements.
+
+    Returns:
+        dict: the source of every class, by its file name.
+    """
+    rng = random.Random(seed)
+    names = [f"Class{number}" for number in range(files)]
+    return {f"{name}.jack": ClassGenerator(
+                rng, name, names, subroutines, depth).generate()
+            for name in names}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("directory", help="the directory to write to")
+    parser.add_argument("--files", type=int, default=100,
+                        help="number of classes (default: 100)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the generator (default: 0)")
+    args = parser.parse_args()
+    os.makedirs(args.directory, exist_ok=True)
+    for filename, source in generate_corpus(args.files, args.seed).items():
+        with open(os.path.join(args.directory, filename), 'w') as file:
+            file.write(source)
+
+
+if "__main__" == __name__:
+    main()
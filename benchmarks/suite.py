@@ -0,0 +1,173 @@
+"""
+Throughput benchmark of the whole analyzer, on a generated corpus.
+
+Generates a seeded corpus (see benchmarks.corpus) and times the three
+phases of the analyzer separately on every file: constructing the
+JackTokenizer, parsing the tokens into a tree with the CompilationEngine,
+and emitting the tree as XML. It reports the time of every phase, tokens
+per second and files per second, and the peak RSS of the run. The results
+can be saved as JSON, and compared against a saved run to catch
+regressions.
+
+Usage:
+
+    python -m benchmarks.suite [--files N] [--seed S] [--repeat R]
+        [--output RESULTS.json] [--compare BASELINE.json]
+
+Sample run (Python 3.11, Linux x86-64, the default 200 files, a 9.4 MB
+corpus with 2.3 million tokens):
+
+    phase        best time    tokens/s     files/s
+    tokenize        2.52 s      897255        79.3
+    parse           2.91 s      777194        68.7
+    emit            2.17 s     1042865        92.1
+    total           7.61 s      297611        26.3
+    peak RSS       28.4 MB
+"""
+import argparse
+import io
+import json
+import platform
+import resource
+import sys
+import time
+import typing
+
+import JackAST
+from CompilationEngine import CompilationEngine
+from Emitter import XMLEmitter
+from JackTokenizer import JackTokenizer
+from benchmarks.corpus import generate_corpus
+
+PHASES = ("tokenize", "parse", "emit")
+
+
+def time_file(source: str) -> typing.Tuple[typing.Dict[str, float], int]:
+    """Runs every phase of the analyzer on the source.
+
+    Returns:
+        tuple: the time of every phase, in seconds, and the number of tokens.
+    """
+    times = {}
+    start = time.perf_counter()
+    tokenizer = JackTokenizer(io.StringIO(source))
+    times["tokenize"] = time.perf_counter() - start
+    tokens = len(tokenizer.ids)
+
+    start = time.perf_counter()
+    tree = CompilationEngine(tokenizer, None).parse_class()
+    times["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    JackAST.emit(tree, XMLEmitter(io.StringIO()))
+    times["emit"] = time.perf_counter() - start
+    return times, tokens
+
+
+def run(corpus: typing.Dict[str, str], repeat: int) -> dict:
+    """Times every phase on the whole corpus, repeat times, keeping the best
+    time of every phase.
+
+    Returns:
+        dict: the results, as saved in JSON.
+    """
+    best = {phase: float("inf") for phase in PHASES}
+    tokens = 0
+    for _ in range(repeat):
+        totals = dict.fromkeys(PHASES, 0.0)
+        tokens = 0
+        for source in corpus.values():
+            times, count = time_file(source)
+            tokens += count
+            for phase in PHASES:
+                totals[phase] += times[phase]
+        for phase in PHASES:
+            best[phase] = min(best[phase], totals[phase])
+    best["total"] = sum(best.values())
+
+    files = len(corpus)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": {"files": files, "tokens": tokens,
+                   "bytes": sum(len(source) for source in corpus.values())},
+        "phases": {phase: {"seconds": seconds,
+                           "tokens_per_second": tokens / seconds,
+                           "files_per_second": files / seconds}
+                   for phase, seconds in best.items()},
+        # ru_maxrss is in KB on Linux
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def compare(results: dict, baseline: dict,
+            threshold: float) -> typing.List[str]:
+    """
+    Args:
+        results (dict): the results of this run.
+        baseline (dict): the results of a previous run.
+        threshold (float): the largest slowdown that is not a regression,
+            e.g. 0.1 for 10%.
+
+    Returns:
+        list: the phases that are slower than in the baseline by more than
+        the threshold, and a description of the change in each.
+    """
+    regressions = []
+    for phase, result in results["phases"].items():
+        if phase not in baseline["phases"]:
+            continue
+        before = baseline["phases"][phase]["tokens_per_second"]
+        after = result["tokens_per_second"]
+        change = after / before - 1
+        print(f"{phase:<12}{before:>12.0f} -> {after:>10.0f} tokens/s "
+              f"({change:+.1%})")
+        if change < -threshold:
+            regressions.append(f"{phase} is {-change:.1%} slower")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--files", type=int, default=200,
+                        help="number of generated files (default: 200)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the corpus generator (default: 0)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of timed runs (default: 3)")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="compare against the results in this JSON file, "
+                             "and fail if a phase regressed")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="the slowdown of a phase that counts as a "
+                             "regression (default: 0.1, 10%%)")
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.files, args.seed)
+    results = run(corpus, args.repeat)
+    results["corpus"]["seed"] = args.seed
+
+    print(f"{'phase':<12}{'best time':>11}{'tokens/s':>12}{'files/s':>12}")
+    for phase, result in results["phases"].items():
+        print(f"{phase:<12}{result['seconds']:>9.2f} s"
+              f"{result['tokens_per_second']:>12.0f}"
+              f"{result['files_per_second']:>12.1f}")
+    print(f"{'peak RSS':<12}{results['peak_rss_kb'] / 1024:>8.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    if args.compare:
+        with open(args.compare, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline["corpus"] != results["corpus"]:
+            print("warning: the baseline was measured on a different corpus",
+                  file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            sys.exit("Regressions: " + ", ".join(regressions))
+
+
+if "__main__" == __name__:
+    main()